@@ -2,12 +2,32 @@
 """Script to apply Sentry alerts from YAML files to Sentry organization."""
 
 import os
+import re
 import sys
 import glob
+import hashlib
+import json
+import tempfile
+import threading
 import yaml
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any, Dict, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # libyaml-backed loader is much faster than the pure-Python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Upper bound on concurrent alert upserts; stays below the session's pool size
+MAX_WORKERS = 8
+
+# Parsed YAML is cached as JSON in this directory, next to the alerts directory
+CACHE_DIR_NAME = ".sentralert_cache"
 
 
 class SentryAlertApplier:
@@ -29,6 +49,29 @@ class SentryAlertApplier:
             "Content-Type": "application/json",
         }
         self._default_member_id = None  # Cache for default member ID
+        self._projects_cache: List[Dict[str, Any]] | None = None
+        self._alerts_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._alerts_by_name: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._cache_lock = threading.Lock()  # Guards cache writes from worker threads
+
+        # Reuse one session so every request shares pooled keep-alive connections
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        self.session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retries),
+        )
+
+    def close(self) -> None:
+        """Close the underlying HTTP session and release pooled connections."""
+        self.session.close()
+
+    def invalidate(self) -> None:
+        """Drop cached projects and alert rules so the next lookup refetches them."""
+        self._projects_cache = None
+        self._alerts_cache.clear()
+        self._alerts_by_name.clear()
 
     def get_default_member_id(self) -> str:
         """
@@ -42,7 +85,7 @@ class SentryAlertApplier:
             return self._default_member_id
 
         url = f"{self.api_url}/organizations/{self.org_slug}/members/"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         response.raise_for_status()
         members = response.json()
 
@@ -58,11 +101,18 @@ class SentryAlertApplier:
         raise ValueError("No members found in organization")
 
     def get_projects(self) -> List[Dict[str, Any]]:
-        """Get all projects in the organization."""
+        """
+        Get all projects in the organization.
+        Caches the result for the lifetime of the applier.
+        """
+        if self._projects_cache is not None:
+            return self._projects_cache
+
         url = f"{self.api_url}/organizations/{self.org_slug}/projects/"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         response.raise_for_status()
-        return response.json()
+        self._projects_cache = response.json()
+        return self._projects_cache
 
     def get_project_by_environment(self, environment: str) -> str:
         """
@@ -85,6 +135,7 @@ class SentryAlertApplier:
     def list_existing_alerts(self, project_slug: str) -> List[Dict[str, Any]]:
         """
         List all existing metric alerts for a project.
+        Caches the result per project slug.
 
         Args:
             project_slug: Project slug
@@ -92,10 +143,61 @@ class SentryAlertApplier:
         Returns:
             List of existing alert rules
         """
+        if project_slug in self._alerts_cache:
+            return self._alerts_cache[project_slug]
+
         url = f"{self.api_url}/projects/{self.org_slug}/{project_slug}/alert-rules/"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         response.raise_for_status()
-        return response.json()
+        alerts = response.json()
+        self._alerts_cache[project_slug] = alerts
+        self._alerts_by_name[project_slug] = {alert.get("name"): alert for alert in alerts}
+        return alerts
+
+    def list_all_alerts_org(self) -> List[Dict[str, Any]]:
+        """
+        List existing metric alerts for every project in one paginated pass.
+
+        Uses the organization-level alert-rules endpoint and populates the
+        per-project caches from it. Falls back to per-project listing when
+        the endpoint is unavailable (404).
+
+        Returns:
+            List of existing alert rules across all projects
+        """
+        url = f"{self.api_url}/organizations/{self.org_slug}/alert-rules/"
+        params = {"per_page": 100}
+        alerts: List[Dict[str, Any]] = []
+
+        while url:
+            response = self.session.get(url, params=params)
+            if response.status_code == 404:
+                alerts = []
+                for project in self.get_projects():
+                    alerts.extend(self.list_existing_alerts(project["slug"]))
+                return alerts
+            response.raise_for_status()
+            alerts.extend(response.json())
+
+            # Sentry paginates with Link headers; the next URL already carries the cursor
+            next_link = response.links.get("next", {})
+            url = next_link.get("url") if next_link.get("results") == "true" else None
+            params = None
+
+        by_project: Dict[str, List[Dict[str, Any]]] = {
+            project["slug"]: [] for project in self.get_projects()
+        }
+        for alert in alerts:
+            for project_slug in alert.get("projects", []):
+                by_project.setdefault(project_slug, []).append(alert)
+
+        for project_slug, project_alerts in by_project.items():
+            self._alerts_cache[project_slug] = project_alerts
+            self._alerts_by_name[project_slug] = {
+                alert.get("name"): alert for alert in project_alerts
+            }
+
+        return alerts
 
     def find_alert_by_name(self, project_slug: str, alert_name: str) -> Dict[str, Any] | None:
         """
@@ -108,11 +210,9 @@ class SentryAlertApplier:
         Returns:
             Alert rule if found, None otherwise
         """
-        existing_alerts = self.list_existing_alerts(project_slug)
-        for alert in existing_alerts:
-            if alert.get("name") == alert_name:
-                return alert
-        return None
+        if project_slug not in self._alerts_by_name:
+            self.list_existing_alerts(project_slug)
+        return self._alerts_by_name.get(project_slug, {}).get(alert_name)
 
     def map_dataset(self, dataset: str) -> str:
         """
@@ -144,8 +244,6 @@ class SentryAlertApplier:
         Returns:
             Sentry-compatible aggregate string
         """
-        import re
-
         # Convert percentile(0.95, field) to p95(field)
         percentile_match = re.match(r'percentile\((0\.\d+),\s*(.+?)\)', aggregate)
         if percentile_match:
@@ -181,17 +279,21 @@ class SentryAlertApplier:
         if existing_alert:
             # Update existing alert
             url = f"{self.api_url}/projects/{self.org_slug}/{project_slug}/alert-rules/{existing_alert['id']}/"
-            response = requests.put(url, json=payload, headers=self.headers)
+            response = self.session.put(url, json=payload)
         else:
             # Create new alert
             url = f"{self.api_url}/projects/{self.org_slug}/{project_slug}/alert-rules/"
-            response = requests.post(url, json=payload, headers=self.headers)
+            response = self.session.post(url, json=payload)
 
         try:
             response.raise_for_status()
             action = "Updated" if existing_alert else "Created"
             print(f"{action} alert: {alert_config['name']}")
-            return response.json()
+            alert = response.json()
+            # Keep the name index consistent without refetching the rule list
+            with self._cache_lock:
+                self._alerts_by_name.setdefault(project_slug, {})[alert_config["name"]] = alert
+            return alert
         except requests.exceptions.HTTPError as e:
             print(f"API Error: {e}")
             print(f"Response: {response.text}")
@@ -284,48 +386,206 @@ class SentryAlertApplier:
 
         return actions
 
-    def apply_alerts_from_directory(self, alerts_dir: str) -> List[Dict[str, Any]]:
+    def _load_alert_config(
+        self, path: Path, cache_dir: Path, st: os.stat_result | None = None
+    ) -> Dict[str, Any]:
         """
-        Apply all alerts from YAML files in a directory.
+        Load an alert YAML file, reusing a cached JSON copy when it is unchanged.
+
+        The cache key combines the file name, a hash of its resolved path, and
+        its mtime and size, so same-named files in different alert directories
+        never share an entry, any edit produces a new entry, and stale entries
+        for the same file are pruned.
 
         Args:
-            alerts_dir: Directory containing alert YAML files
+            path: Path to the alert YAML file
+            cache_dir: Directory holding the parsed-config cache
+            st: Already-known stat result for the file, fetched if omitted
 
         Returns:
-            List of created/updated alert rules
+            Parsed alert configuration
         """
-        alerts_path = Path(alerts_dir)
-        if not alerts_path.exists():
-            print(f"Alerts directory not found: {alerts_dir}")
-            return []
+        if st is None:
+            st = path.stat()
+        path_hash = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+        prefix = f"{path.name}-{path_hash}"
+        key = f"{prefix}-{st.st_mtime_ns}-{st.st_size}"
+        cache_file = cache_dir / f"{key}.json"
+
+        if cache_file.exists():
+            try:
+                with open(cache_file, "r") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                # Unreadable or corrupt entry: reparse the YAML and rewrite it
+                pass
 
-        # Find all YAML files
-        yaml_files = list(alerts_path.glob("*.yaml")) + list(alerts_path.glob("*.yml"))
+        with open(path, "r") as f:
+            alert_config = yaml.load(f, Loader=SafeLoader)
 
-        if not yaml_files:
-            print(f"No YAML files found in {alerts_dir}")
-            return []
+        try:
+            # Serialize first so values JSON can't encode (e.g. dates) fail
+            # before anything is written
+            data = json.dumps(alert_config)
+            cache_dir.mkdir(exist_ok=True)
+            stale = re.compile(re.escape(prefix) + r"-\d+-\d+\.json")
+            for entry in cache_dir.iterdir():
+                if entry != cache_file and stale.fullmatch(entry.name):
+                    entry.unlink()
+            # Write to a temp file and rename so readers never see partial data
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(data)
+                os.replace(tmp, cache_file)
+            except OSError:
+                os.unlink(tmp)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            # Caching is best-effort; the parsed config is still usable
+            print(f"Warning: could not cache {path.name}: {e}")
+
+        return alert_config
+
+    def _load_metric_alert_configs(
+        self, yaml_files: List[os.DirEntry], cache_dir: Path
+    ) -> List[tuple[os.DirEntry, Dict[str, Any]]]:
+        """
+        Parse alert YAML files and keep only metric alerts.
 
-        results = []
+        Args:
+            yaml_files: Directory entries of the alert YAML files to parse
+            cache_dir: Directory holding the parsed-config cache
+
+        Returns:
+            List of (directory entry, alert configuration) pairs
+        """
+        alert_configs = []
         for yaml_file in yaml_files:
             print(f"\nProcessing {yaml_file.name}...")
             try:
-                with open(yaml_file, "r") as f:
-                    alert_config = yaml.safe_load(f)
+                alert_config = self._load_alert_config(
+                    Path(yaml_file.path), cache_dir, yaml_file.stat()
+                )
 
                 # Skip if not a metric alert
                 if alert_config.get("kind") != "sentry.metric_alert":
                     print(f"Skipping {yaml_file.name} - not a metric alert")
                     continue
 
-                result = self.create_or_update_alert(alert_config)
-                results.append(result)
+                alert_configs.append((yaml_file, alert_config))
 
             except Exception as e:
                 print(f"Error processing {yaml_file.name}: {e}")
                 # Continue processing other files
                 continue
 
+        return alert_configs
+
+    def _dedupe_alert_configs(
+        self, alert_configs: List[tuple[os.DirEntry, Dict[str, Any]]]
+    ) -> List[tuple[os.DirEntry, Dict[str, Any]]]:
+        """
+        Keep one config per alert rule, the later file winning on collisions.
+
+        Upserts run concurrently, so two files defining the same rule would
+        both see it as missing and each POST a new one. Rules are identified
+        the way create_or_update_alert looks them up, by target project and
+        name, so this must run after get_projects() has been prewarmed.
+
+        Args:
+            alert_configs: (directory entry, alert configuration) pairs, in
+                file order
+
+        Returns:
+            Deduplicated (directory entry, alert configuration) pairs
+        """
+        by_rule = {}
+        for yaml_file, alert_config in alert_configs:
+            environment = alert_config.get("environment", "production")
+            key = (self.get_project_by_environment(environment), alert_config.get("name"))
+            if key in by_rule:
+                print(
+                    f"Warning: {yaml_file.name} redefines alert '{key[1]}' "
+                    f"from {by_rule[key][0].name}; using {yaml_file.name}"
+                )
+                del by_rule[key]
+            by_rule[key] = (yaml_file, alert_config)
+
+        return list(by_rule.values())
+
+    def _prewarm_caches(self) -> None:
+        """
+        Fetch projects, existing alert rules and the notification member once.
+
+        After this, every lookup made while building and upserting alerts is
+        served from the instance caches, so worker threads never race to issue
+        the same GET.
+        """
+        self.get_projects()
+        self.list_all_alerts_org()
+        self.get_default_member_id()
+
+    def apply_alerts_from_directory(self, alerts_dir: str) -> List[Dict[str, Any]]:
+        """
+        Apply all alerts from YAML files in a directory.
+
+        Args:
+            alerts_dir: Directory containing alert YAML files
+
+        Returns:
+            List of created/updated alert rules
+        """
+        alerts_path = Path(alerts_dir)
+        if not alerts_path.exists():
+            print(f"Alerts directory not found: {alerts_dir}")
+            return []
+
+        cache_dir = alerts_path.resolve().parent / CACHE_DIR_NAME
+
+        # Find all YAML files in one directory pass; entries cache their stat().
+        # Sorted so the winner among same-name alerts does not depend on
+        # directory order
+        with os.scandir(alerts_path) as it:
+            yaml_files = sorted(
+                (
+                    entry for entry in it
+                    if entry.is_file() and entry.name.endswith((".yaml", ".yml"))
+                ),
+                key=lambda entry: entry.name,
+            )
+
+        if not yaml_files:
+            print(f"No YAML files found in {alerts_dir}")
+            return []
+
+        # Phase 1: parse every file before touching the API
+        alert_configs = self._load_metric_alert_configs(yaml_files, cache_dir)
+        if not alert_configs:
+            return []
+
+        # Phase 2: fetch existing Sentry state once so upserts only hit the cache,
+        # then drop configs that target the same rule as a later file
+        try:
+            self._prewarm_caches()
+            alert_configs = self._dedupe_alert_configs(alert_configs)
+        except Exception as e:
+            print(f"Error fetching existing Sentry state: {e}")
+            return []
+
+        # Phase 3: one PUT/POST per alert, dispatched concurrently
+        results = []
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(self.create_or_update_alert, alert_config): yaml_file
+                for yaml_file, alert_config in alert_configs
+            }
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Error processing {futures[future].name}: {e}")
+
         return results
 
 
@@ -361,6 +621,8 @@ def main():
     except Exception as e:
         print(f"\nFatal error: {e}")
         sys.exit(1)
+    finally:
+        applier.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+"""JSON helpers that use orjson when it is installed and fall back to stdlib json."""
+
+import json
+from collections.abc import Iterator
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch this either way
+JSONDecodeError = json.JSONDecodeError
+
+
+def _default(obj: Any) -> Any:
+    """Serialize iterators (e.g. generator expressions) as JSON arrays."""
+    if isinstance(obj, Iterator):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, pretty: bool = False) -> str:
+    """
+    Serialize an object to a JSON string.
+
+    Iterators anywhere in the object are consumed and written as arrays, so
+    callers can pass generator expressions instead of building lists.
+
+    Args:
+        obj: Object to serialize
+        pretty: Indent the output with two spaces
+
+    Returns:
+        JSON string
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, default=_default, option=option).decode()
+    return json.dumps(obj, default=_default, indent=2 if pretty else None)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON document.
+
+    Args:
+        data: JSON text as str or bytes
+
+    Returns:
+        Parsed Python object
+
+    Raises:
+        JSONDecodeError: If the document is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
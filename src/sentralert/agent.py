@@ -1,10 +1,24 @@
 """Main AlertAgent orchestrator for running analysis flows."""
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
 from .clients import ClaudeClient, SentryClient
 from .flows import HistoricalAnalysisFlow
 
+# Characters in alert names that are replaced when building file names
+_SLUG_TABLE = str.maketrans({" ": "-", "/": "-"})
+
+# Upper bound on concurrent YAML file writes in save_as_yaml
+_MAX_WRITE_WORKERS = 32
+
 
 class AlertAgent:
     """
@@ -20,6 +34,7 @@ class AlertAgent:
         sentry_client: SentryClient,
         claude_client: ClaudeClient,
         output_dir: str = "alerts",
+        use_batch: bool = False,
     ):
         """
         Initialize the AlertAgent.
@@ -28,11 +43,13 @@ class AlertAgent:
             sentry_client: Client for querying Sentry metrics
             claude_client: Client for AI-powered analysis
             output_dir: Directory to save generated alert files
+            use_batch: Validate latency regressions through the Message Batches API
         """
         self.sentry = sentry_client
         self.claude = claude_client
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.use_batch = use_batch
 
         # Initialize flow lazily to avoid requiring unnecessary configuration
         self._historical_flow = None
@@ -41,7 +58,9 @@ class AlertAgent:
     def historical_flow(self):
         """Lazy initialization of historical analysis flow."""
         if self._historical_flow is None:
-            self._historical_flow = HistoricalAnalysisFlow(self.sentry, self.claude)
+            self._historical_flow = HistoricalAnalysisFlow(
+                self.sentry, self.claude, use_batch=self.use_batch
+            )
         return self._historical_flow
 
     def run(self, flow: str = "historical") -> list[dict]:
@@ -75,24 +94,44 @@ class AlertAgent:
         Returns:
             List of paths to saved YAML files
         """
-        import yaml
-
-        saved_files = []
-
+        pairs = []
         for suggestion in suggestions:
             # Create filename from alert name
-            name_slug = (
-                suggestion["name"].lower().replace(" ", "-").replace("/", "-")
-            )
+            name_slug = suggestion["name"].lower().translate(_SLUG_TABLE)
             filename = self.output_dir / f"{name_slug}.yaml"
 
             # Add metadata
             suggestion["proposed_by"] = suggestion.get("flow", "unknown")
 
-            with open(filename, "w") as f:
-                yaml.dump(suggestion, f, default_flow_style=False, sort_keys=False)
+            pairs.append((filename, suggestion))
+
+        if not pairs:
+            return []
 
-            saved_files.append(filename)
+        # Write files concurrently; when two names map to the same file the
+        # later suggestion wins, as it would with sequential writes
+        writes = dict(pairs)
+        with ThreadPoolExecutor(max_workers=min(_MAX_WRITE_WORKERS, len(writes))) as executor:
+            list(executor.map(self._write_yaml, writes.items()))
+
+        saved_files = [filename for filename, _ in pairs]
+        for filename in saved_files:
             print(f"  Saved: {filename}")
 
         return saved_files
+
+    @staticmethod
+    def _write_yaml(pair: tuple[Path, dict]) -> Path:
+        """
+        Write a single suggestion to its YAML file.
+
+        Args:
+            pair: Destination path and the suggestion to write
+
+        Returns:
+            Path of the written file
+        """
+        filename, suggestion = pair
+        with open(filename, "w") as f:
+            yaml.dump(suggestion, f, Dumper=SafeDumper, default_flow_style=False, sort_keys=False)
+        return filename
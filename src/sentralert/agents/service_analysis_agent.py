@@ -1,13 +1,22 @@
 """Service Analysis Agent using Claude Agent SDK."""
 
-import json
-from typing import Any
-
-from anthropic import Anthropic
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Optional
 
+from .. import _json
 from ..clients.sentry_client import SentryClient
 from .tools import create_deepwiki_tool_definition, create_sentry_traces_tool_definition
 
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+
+# Number of most recent tool results resent verbatim on each agent turn
+KEEP_FULL_TOOL_RESULTS = 2
+
+# Maximum number of tool calls from a single turn executed concurrently
+MAX_PARALLEL_TOOLS = 4
+
 
 class ServiceAnalysisAgent:
     """
@@ -22,6 +31,7 @@ class ServiceAnalysisAgent:
         anthropic_api_key: str,
         sentry_client: SentryClient,
         deepwiki_repo_url: str = "https://deepwiki.com/wuTims/sentralert-demo-service",
+        client: Optional["Anthropic"] = None,
     ):
         """
         Initialize the service analysis agent.
@@ -30,8 +40,14 @@ class ServiceAnalysisAgent:
             anthropic_api_key: Anthropic API key for Claude
             sentry_client: Configured SentryClient instance
             deepwiki_repo_url: URL to the deepwiki repository
+            client: Existing Anthropic client to share (created if None)
         """
-        self.client = Anthropic(api_key=anthropic_api_key)
+        if client is None:
+            from anthropic import Anthropic
+
+            client = Anthropic(api_key=anthropic_api_key)
+
+        self.client = client
         self.model = "claude-haiku-4-5-20251001"
         self.sentry_client = sentry_client
         self.deepwiki_repo_url = deepwiki_repo_url
@@ -49,7 +65,14 @@ class ServiceAnalysisAgent:
         deepwiki_tool = create_deepwiki_tool_definition(self.deepwiki_repo_url)
         sentry_tool = create_sentry_traces_tool_definition(self.sentry_client)
 
-        # Return tool definitions in Claude API format
+        # Keep the callables so tool invocations reuse them instead of rebuilding
+        self._tool_funcs = {
+            deepwiki_tool["name"]: deepwiki_tool["function"],
+            sentry_tool["name"]: sentry_tool["function"],
+        }
+
+        # Return tool definitions in Claude API format; the cache breakpoint on
+        # the last tool caches the full tool list across agent turns
         return [
             {
                 "name": deepwiki_tool["name"],
@@ -60,6 +83,7 @@ class ServiceAnalysisAgent:
                 "name": sentry_tool["name"],
                 "description": sentry_tool["description"],
                 "input_schema": sentry_tool["input_schema"],
+                "cache_control": {"type": "ephemeral"},
             },
         ]
 
@@ -73,14 +97,10 @@ class ServiceAnalysisAgent:
         Returns:
             Callable tool function
         """
-        if tool_name == "query_deepwiki_codebase":
-            tool_def = create_deepwiki_tool_definition(self.deepwiki_repo_url)
-            return tool_def["function"]
-        elif tool_name == "query_sentry_traces":
-            tool_def = create_sentry_traces_tool_definition(self.sentry_client)
-            return tool_def["function"]
-        else:
-            raise ValueError(f"Unknown tool: {tool_name}")
+        try:
+            return self._tool_funcs[tool_name]
+        except KeyError:
+            raise ValueError(f"Unknown tool: {tool_name}") from None
 
     def _execute_tool(self, tool_name: str, tool_input: dict[str, Any]) -> str:
         """
@@ -127,76 +147,95 @@ class ServiceAnalysisAgent:
         else:
             prompt = self._build_quick_prompt()
 
-        # Run the agent loop
-        messages = [{"role": "user", "content": prompt}]
+        # Run the agent loop. The prompt is a cacheable block so repeated
+        # requests reuse the server-side prompt cache for the shared prefix.
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}
+                ],
+            }
+        ]
         execution_trace = []
         max_iterations = 10
         iteration = 0
 
-        while iteration < max_iterations:
-            iteration += 1
-
-            # Call Claude with tools
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                tools=self.tools,
-                messages=messages,
-            )
-
-            # Check if we're done
-            if response.stop_reason == "end_turn":
-                # Extract final response
-                final_content = ""
-                for block in response.content:
-                    if hasattr(block, "text"):
-                        final_content += block.text
-
-                # Parse and return results
-                return self._parse_final_response(final_content, execution_trace)
-
-            # Handle tool use
-            if response.stop_reason == "tool_use":
-                # Add assistant message to conversation
-                messages.append({"role": "assistant", "content": response.content})
-
-                # Execute all tool calls
-                tool_results = []
-                for block in response.content:
-                    if block.type == "tool_use":
-                        tool_name = block.name
-                        tool_input = block.input
-
-                        print(f"  Agent calling tool: {tool_name}")
-                        print(f"    Input: {json.dumps(tool_input, indent=2)}")
-
-                        # Execute the tool
-                        result = self._execute_tool(tool_name, tool_input)
-
-                        # Record execution
-                        execution_trace.append(
-                            {
-                                "iteration": iteration,
-                                "tool": tool_name,
-                                "input": tool_input,
-                                "output": json.loads(result),
-                            }
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TOOLS) as executor:
+            while iteration < max_iterations:
+                iteration += 1
+
+                # Older tool outputs have already been consumed; shrink them to digests
+                self._compact_tool_results(messages)
+
+                # Stream the response so each tool starts as soon as its block is
+                # complete; independent tool calls in one turn overlap their I/O
+                pending = []
+                with self.client.messages.stream(
+                    model=self.model,
+                    max_tokens=4096,
+                    tools=self.tools,
+                    messages=messages,
+                ) as stream:
+                    for event in stream:
+                        if event.type != "content_block_stop":
+                            continue
+                        block = event.content_block
+                        if block.type != "tool_use":
+                            continue
+
+                        print(f"  Agent calling tool: {block.name}")
+                        print(f"    Input: {_json.dumps(block.input, pretty=True)}")
+
+                        pending.append(
+                            (block, executor.submit(self._execute_tool, block.name, block.input))
                         )
 
-                        # Add to tool results
-                        tool_results.append(
-                            {
-                                "type": "tool_result",
-                                "tool_use_id": block.id,
-                                "content": result,
-                            }
-                        )
+                    response = stream.get_final_message()
 
-                # Add tool results to conversation
-                messages.append({"role": "user", "content": tool_results})
-            else:
-                # Unexpected stop reason
-                break
+                # Collect results in the order Claude issued the calls
+                tool_results = []
+                for block, future in pending:
+                    result = future.result()
+
+                    # Record execution
+                    execution_trace.append(
+                        {
+                            "iteration": iteration,
+                            "tool": block.name,
+                            "input": block.input,
+                            "output": _json.loads(result),
+                        }
+                    )
+
+                    # Add to tool results
+                    tool_results.append(
+                        {
+                            "type": "tool_result",
+                            "tool_use_id": block.id,
+                            "content": result,
+                        }
+                    )
+
+                # Check if we're done
+                if response.stop_reason == "end_turn":
+                    # Extract final response
+                    final_content = ""
+                    for block in response.content:
+                        if hasattr(block, "text"):
+                            final_content += block.text
+
+                    # Parse and return results
+                    return self._parse_final_response(final_content, execution_trace)
+
+                # Handle tool use
+                if response.stop_reason == "tool_use":
+                    # Add assistant message and tool results to conversation
+                    messages.append({"role": "assistant", "content": response.content})
+                    messages.append({"role": "user", "content": tool_results})
+                else:
+                    # Unexpected stop reason
+                    break
 
         # If we hit max iterations, return what we have
         return {
@@ -205,6 +244,36 @@ class ServiceAnalysisAgent:
             "suggestions": [],
         }
 
+    @staticmethod
+    def _compact_tool_results(messages: list[dict[str, Any]]) -> None:
+        """
+        Replace already-consumed tool results with a short digest.
+
+        Every turn resends the whole transcript, so stale tool outputs are
+        reduced to their size and hash to keep input tokens from growing
+        quadratically with the number of iterations. Results in the last user
+        message have not been seen by Claude yet and are always sent in full;
+        of the earlier ones, the KEEP_FULL_TOOL_RESULTS newest are kept too.
+
+        Args:
+            messages: Conversation messages, modified in place
+        """
+        kept = 0
+        for message in reversed(messages[:-1]):
+            if message["role"] != "user" or not isinstance(message["content"], list):
+                continue
+            for block in reversed(message["content"]):
+                if block.get("type") != "tool_result":
+                    continue
+                if kept < KEEP_FULL_TOOL_RESULTS:
+                    kept += 1
+                    continue
+                content = block["content"]
+                if content.startswith("<result:"):
+                    continue
+                digest = hashlib.sha1(content.encode()).hexdigest()[:8]
+                block["content"] = f"<result: {len(content.encode())} bytes, hash={digest}>"
+
     def _build_comprehensive_prompt(self) -> str:
         """Build prompt for comprehensive service analysis."""
         return """You are a service analysis agent. Your task is to analyze a production service by combining codebase insights with actual production metrics to propose intelligent monitoring alerts.
@@ -304,7 +373,7 @@ Provide response in JSON format."""
             else:
                 json_text = response_text
 
-            analysis = json.loads(json_text)
+            analysis = _json.loads(json_text)
 
             # Convert to Sentry alert format
             suggestions = []
@@ -348,7 +417,7 @@ Provide response in JSON format."""
                 "execution_trace": execution_trace,
             }
 
-        except (json.JSONDecodeError, KeyError, AttributeError) as e:
+        except (_json.JSONDecodeError, KeyError, AttributeError) as e:
             # Fallback: return raw response
             return {
                 "error": f"Failed to parse response: {str(e)}",
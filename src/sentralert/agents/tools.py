@@ -1,135 +1,323 @@
 """Tools for the service analysis agent."""
 
 import asyncio
-import json
-from typing import Any
+import atexit
+import threading
+import time
+from collections.abc import Coroutine
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
+
+from .. import _json
+from ..clients.sentry_client import SentryClient
 
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+if TYPE_CHECKING:
+    from mcp import ClientSession
 
-from ..clients.sentry_client import SentryClient
+T = TypeVar("T")
+
+# Shared pool for overlapping independent Sentry discover requests
+_DISCOVER_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sentry-discover")
+
+# Event loop running on a daemon thread, shared by all synchronous tool calls
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_THREAD: Optional[threading.Thread] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start the background event loop thread on first use.
+
+    Returns:
+        Event loop running forever on a daemon thread
+    """
+    global _LOOP, _LOOP_THREAD
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="sentralert-tools", daemon=True)
+            thread.start()
+            _LOOP, _LOOP_THREAD = loop, thread
+            atexit.register(_shutdown_loop)
+        return _LOOP
+
+
+def _shutdown_loop() -> None:
+    """
+    Stop the background loop, cancelling pending tasks and closing it.
+
+    Mirrors asyncio.Runner.close() so open MCP sessions are unwound instead of
+    being destroyed with the interpreter.
+    """
+    global _LOOP, _LOOP_THREAD
+    with _LOOP_LOCK:
+        loop, thread = _LOOP, _LOOP_THREAD
+        _LOOP, _LOOP_THREAD = None, None
+    if loop is None:
+        return
+
+    async def cancel_pending() -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await loop.shutdown_asyncgens()
+
+    try:
+        asyncio.run_coroutine_threadsafe(cancel_pending(), loop).result(timeout=5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    if not thread.is_alive():
+        loop.close()
+
+
+def _submit(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine on the background loop and wait for its result.
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+# Mock DeepWiki answer returned when the MCP server is unreachable. It is
+# serialized once; the quoted "__QUERY__", "__REPO__" and "__NOTE__" sentinels
+# are swapped for JSON-encoded per-call values.
+_FALLBACK_TEMPLATE = _json.dumps(
+    {
+        "query": "__QUERY__",
+        "codebase_insights": {
+            "endpoints": [
+                {
+                    "path": "/api/checkout",
+                    "method": "POST",
+                    "description": "Process customer checkout",
+                    "monitored": False,
+                },
+                {
+                    "path": "/api/refund",
+                    "method": "POST",
+                    "description": "Process refund requests",
+                    "monitored": False,
+                },
+                {
+                    "path": "/api/orders/{id}",
+                    "method": "GET",
+                    "description": "Retrieve order details",
+                    "monitored": True,
+                },
+            ],
+            "services": [
+                {"name": "PaymentService", "external_api": True},
+                {"name": "OrderService", "database": "postgresql"},
+            ],
+            "code_structure": {
+                "framework": "FastAPI",
+                "language": "Python",
+                "api_version": "v1",
+            },
+            "dependencies": ["stripe", "postgresql", "redis"],
+            "potential_issues": [
+                "No error handling on /api/checkout payment processing",
+                "Missing timeout configuration for external API calls",
+            ],
+        },
+        "metadata": {
+            "repo": "__REPO__",
+            "note": "__NOTE__",
+            "source": "fallback_mock",
+        },
+    },
+    pretty=True,
+)
 
 
 class DeepWikiTool:
     """Tool for querying deepwiki MCP server for codebase insights using the Model Context Protocol."""
 
-    def __init__(self, repo_url: str = "https://deepwiki.com/wuTims/sentralert-demo-service"):
+    def __init__(
+        self,
+        repo_url: str = "https://deepwiki.com/wuTims/sentralert-demo-service",
+        cache_ttl: float = 900.0,
+    ):
         """
         Initialize deepwiki MCP tool.
 
         Args:
             repo_url: URL to the deepwiki repository (e.g., "https://deepwiki.com/owner/repo")
+            cache_ttl: Seconds to reuse a successful answer to the same question
         """
         self.repo_url = repo_url
         # Extract repo path (e.g., "owner/repo" from "https://deepwiki.com/owner/repo")
         self.repo = repo_url.replace("https://deepwiki.com/", "")
         # DeepWiki MCP server endpoint
         self.mcp_server_url = "https://mcp.deepwiki.com/sse"
-
-    async def _query_async(self, query: str) -> str:
+        # Successful answers keyed by normalized query; the agent often repeats questions.
+        # Entries expire so a long-lived process (e.g. the daemon) picks up repo changes.
+        self.cache_ttl = cache_ttl
+        self._cache: dict[str, tuple[float, str]] = {}
+        self._cache_lock = threading.Lock()
+
+        # Persistent MCP session, owned by a long-lived task on self._loop
+        self._session: Optional[ClientSession] = None
+        self._session_closed: Optional[asyncio.Event] = None
+        self._session_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> "DeepWikiTool":
+        """Open the MCP session up front when used as an async context manager."""
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Close the MCP session."""
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the persistent MCP session, if one is open."""
+        if self._session_closed is not None:
+            self._session_closed.set()
+        if self._session_task is not None:
+            try:
+                await self._session_task
+            except Exception:
+                pass
+        self._session = None
+        self._session_closed = None
+        self._session_task = None
+
+    async def _hold_session(self, ready: asyncio.Future, closed: asyncio.Event) -> None:
         """
-        Async implementation of deepwiki MCP query.
+        Own the SSE connection and MCP session until asked to close.
 
-        Args:
-            query: Natural language query about the codebase
+        The transport's task group must be entered and exited by the same task,
+        so this task keeps the contexts open while query tasks share the session.
 
-        Returns:
-            JSON string with codebase insights
+        Args:
+            ready: Future resolved with the initialized session (or the connect error)
+            closed: Event that, once set, tears the session down
         """
+        # The MCP SDK is only imported once a DeepWiki query actually runs
+        from mcp import ClientSession
+        from mcp.client.sse import sse_client
+
         try:
             # Connect to DeepWiki MCP server via SSE transport
             async with sse_client(self.mcp_server_url) as (read, write):
                 async with ClientSession(read, write) as session:
                     # Initialize the MCP session
                     await session.initialize()
+                    self._session = session
+                    ready.set_result(session)
+                    await closed.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            if self._session_closed is closed:
+                self._session = None
 
-                    # Call the ask_question tool provided by DeepWiki MCP
-                    result = await session.call_tool(
-                        "ask_question",
-                        arguments={
-                            "repo": self.repo,
-                            "question": query,
-                        },
-                    )
+    async def _get_session(self) -> "ClientSession":
+        """
+        Return the shared MCP session, connecting on first use.
 
-                    # Extract the response content
-                    response_text = result.content[0].text if result.content else "{}"
-
-                    # Try to parse as JSON, or wrap in structured format
-                    try:
-                        # If response is already JSON, parse and re-structure
-                        data = json.loads(response_text)
-                        structured_result = {
-                            "query": query,
-                            "codebase_insights": data,
-                            "metadata": {
-                                "repo": self.repo,
-                                "source": "deepwiki_mcp",
-                            },
-                        }
-                    except json.JSONDecodeError:
-                        # If response is plain text, structure it
-                        structured_result = {
-                            "query": query,
-                            "codebase_insights": {
-                                "analysis": response_text,
-                            },
-                            "metadata": {
-                                "repo": self.repo,
-                                "source": "deepwiki_mcp",
-                            },
-                        }
-
-                    return json.dumps(structured_result, indent=2)
+        Returns:
+            Initialized MCP client session
+        """
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._session is None:
+                ready = asyncio.get_running_loop().create_future()
+                self._session_closed = asyncio.Event()
+                self._session_task = asyncio.create_task(
+                    self._hold_session(ready, self._session_closed)
+                )
+                await ready
+            return self._session
 
-        except Exception as e:
-            # Fallback to mock data for development/testing when MCP connection fails
-            return json.dumps(
-                {
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        """Normalize a query so trivially different phrasings share a cache entry."""
+        return query.strip().lower()
+
+    async def _query_async(self, query: str) -> str:
+        """
+        Async implementation of deepwiki MCP query.
+
+        Args:
+            query: Natural language query about the codebase
+
+        Returns:
+            JSON string with codebase insights
+        """
+        try:
+            session = await self._get_session()
+            # Call the ask_question tool provided by DeepWiki MCP
+            result = await session.call_tool(
+                "ask_question",
+                arguments={
+                    "repo": self.repo,
+                    "question": query,
+                },
+            )
+
+            # Extract the response content
+            response_text = result.content[0].text if result.content else "{}"
+
+            # Only attempt a parse when the answer looks like a JSON document;
+            # DeepWiki usually answers in prose, which is wrapped as-is
+            data = None
+            if response_text.lstrip()[:1] in ("{", "["):
+                try:
+                    data = _json.loads(response_text)
+                except _json.JSONDecodeError:
+                    pass
+
+            if data is not None:
+                # Embed the parsed document; it is serialized once with the wrapper
+                structured_result = {
+                    "query": query,
+                    "codebase_insights": data,
+                    "metadata": {
+                        "repo": self.repo,
+                        "source": "deepwiki_mcp",
+                    },
+                }
+            else:
+                # If response is plain text, structure it
+                structured_result = {
                     "query": query,
                     "codebase_insights": {
-                        "endpoints": [
-                            {
-                                "path": "/api/checkout",
-                                "method": "POST",
-                                "description": "Process customer checkout",
-                                "monitored": False,
-                            },
-                            {
-                                "path": "/api/refund",
-                                "method": "POST",
-                                "description": "Process refund requests",
-                                "monitored": False,
-                            },
-                            {
-                                "path": "/api/orders/{id}",
-                                "method": "GET",
-                                "description": "Retrieve order details",
-                                "monitored": True,
-                            },
-                        ],
-                        "services": [
-                            {"name": "PaymentService", "external_api": True},
-                            {"name": "OrderService", "database": "postgresql"},
-                        ],
-                        "code_structure": {
-                            "framework": "FastAPI",
-                            "language": "Python",
-                            "api_version": "v1",
-                        },
-                        "dependencies": ["stripe", "postgresql", "redis"],
-                        "potential_issues": [
-                            "No error handling on /api/checkout payment processing",
-                            "Missing timeout configuration for external API calls",
-                        ],
+                        "analysis": response_text,
                     },
                     "metadata": {
                         "repo": self.repo,
-                        "note": f"Mock data (MCP connection failed: {str(e)})",
-                        "source": "fallback_mock",
+                        "source": "deepwiki_mcp",
                     },
-                },
-                indent=2,
+                }
+
+            response = _json.dumps(structured_result, pretty=True)
+
+            # Only real answers are cached so a transient failure is retried
+            with self._cache_lock:
+                self._cache[self._cache_key(query)] = (time.monotonic() + self.cache_ttl, response)
+            return response
+
+        except Exception as e:
+            # Fallback to mock data for development/testing when MCP connection fails
+            return (
+                _FALLBACK_TEMPLATE.replace('"__QUERY__"', _json.dumps(query))
+                .replace('"__REPO__"', _json.dumps(self.repo))
+                .replace('"__NOTE__"', _json.dumps(f"Mock data (MCP connection failed: {str(e)})"))
             )
 
     def __call__(self, query: str) -> str:
@@ -148,26 +336,42 @@ class DeepWikiTool:
             - code_structure: Code organization details
             - potential_issues: Identified potential issues
         """
-        # Run the async query in a new event loop
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If we're already in an async context, create a new loop
-                import concurrent.futures
-
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, self._query_async(query))
-                    return future.result()
-            else:
-                return loop.run_until_complete(self._query_async(query))
-        except RuntimeError:
-            # No event loop, create one
-            return asyncio.run(self._query_async(query))
+        key = self._cache_key(query)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] <= time.monotonic():
+                del self._cache[key]
+                cached = None
+        if cached is not None:
+            return cached[1]
+
+        # Run on the shared background loop so the MCP session outlives this call
+        return _submit(self._query_async(query))
+
+    def close(self) -> None:
+        """Close the MCP session opened by the synchronous __call__."""
+        if self._session_task is not None:
+            _submit(self.aclose())
 
 
 class SentryTracesTool:
     """Tool for querying Sentry API for service traces and metrics."""
 
+    # Discover fields requested on every call; the order matches the unpacking
+    # of rows into the response in __call__
+    _TX_FIELDS = (
+        "transaction",
+        "p50(transaction.duration)",
+        "p95(transaction.duration)",
+        "count()",
+        "failure_rate()",
+    )
+    _ERR_FIELDS = ("title", "count()", "last_seen()")
+
+    # Cap on rows fetched per discover query, so an org-wide query with no
+    # endpoint filter cannot page through every transaction into the tool result
+    _MAX_ROWS = 500
+
     def __init__(self, sentry_client: SentryClient):
         """
         Initialize Sentry traces tool.
@@ -196,76 +400,148 @@ class SentryTracesTool:
             - errors: Recent error events (if include_errors=True)
         """
         try:
-            # Build query
+            # Build queries
             if endpoint_path:
                 query = f'event.type:transaction transaction:"{endpoint_path}"'
+                error_query = f"event.type:error transaction:{endpoint_path}"
             else:
                 query = "event.type:transaction"
+                error_query = "event.type:error"
 
             # Fetch transaction data
-            fields = [
-                "transaction",
-                "p50(transaction.duration)",
-                "p95(transaction.duration)",
-                "count()",
-                "failure_rate()",
-            ]
-            transactions = self.sentry.discover(fields=fields, query=query, stats_period=stats_period)
-
-            # Fetch error data if requested
-            errors = []
+            transactions_future = _DISCOVER_EXECUTOR.submit(
+                self.sentry.discover,
+                fields=self._TX_FIELDS,
+                query=query,
+                stats_period=stats_period,
+                max_rows=self._MAX_ROWS,
+            )
+
+            # Fetch error data if requested, concurrently with the transactions
+            errors_future = None
             if include_errors:
-                error_query = f'event.type:error {f"transaction:{endpoint_path}" if endpoint_path else ""}'
-                error_fields = ["title", "count()", "last_seen()"]
-                errors = self.sentry.discover(
-                    fields=error_fields, query=error_query, stats_period=stats_period
+                errors_future = _DISCOVER_EXECUTOR.submit(
+                    self.sentry.discover,
+                    fields=self._ERR_FIELDS,
+                    query=error_query,
+                    stats_period=stats_period,
+                    max_rows=self._MAX_ROWS,
                 )
 
-            # Structure the response
+            transactions = transactions_future.result()
+
+            # A failed error query still returns the transaction data
+            errors = []
+            errors_failure = None
+            if errors_future is not None:
+                try:
+                    errors = errors_future.result()
+                except Exception as e:
+                    errors_failure = f"Failed to query Sentry errors: {str(e)}"
+
+            # Structure the response; rows are generated lazily while serializing
             result = {
                 "query": {
                     "endpoint": endpoint_path or "all",
                     "period": stats_period,
                 },
-                "transactions": [
+                "transactions": (
                     {
-                        "name": tx.get("transaction"),
+                        "name": name,
                         "metrics": {
-                            "p50_duration_ms": tx.get("p50(transaction.duration)"),
-                            "p95_duration_ms": tx.get("p95(transaction.duration)"),
-                            "count": tx.get("count()"),
-                            "failure_rate": tx.get("failure_rate()"),
+                            "p50_duration_ms": p50,
+                            "p95_duration_ms": p95,
+                            "count": count,
+                            "failure_rate": failure_rate,
                         },
                     }
-                    for tx in transactions
-                ],
-                "errors": [
-                    {
-                        "title": err.get("title"),
-                        "count": err.get("count()"),
-                        "last_seen": err.get("last_seen()"),
-                    }
-                    for err in errors
-                ],
+                    for name, p50, p95, count, failure_rate in (
+                        map(tx.get, self._TX_FIELDS) for tx in transactions
+                    )
+                ),
+                "errors": (
+                    {"title": title, "count": count, "last_seen": last_seen}
+                    for title, count, last_seen in (
+                        map(err.get, self._ERR_FIELDS) for err in errors
+                    )
+                ),
                 "summary": {
                     "total_transactions": len(transactions),
                     "total_errors": len(errors),
                     "monitored": len(transactions) > 0,
+                    "truncated": max(len(transactions), len(errors)) >= self._MAX_ROWS,
                 },
             }
+            if errors_failure:
+                result["error"] = errors_failure
 
-            return json.dumps(result, indent=2)
+            return _json.dumps(result, pretty=True)
 
         except Exception as e:
-            return json.dumps(
+            return _json.dumps(
                 {
                     "error": f"Failed to query Sentry: {str(e)}",
                     "query": {"endpoint": endpoint_path or "all", "period": stats_period},
                 },
-                indent=2,
+                pretty=True,
             )
 
 
+# Static parts of the tool definitions, shared read-only by every factory call
+_DEEPWIKI_DESCRIPTION = (
+    "Query the deepwiki MCP server to get insights about the application codebase. "
+    "Use this to discover endpoints, services, dependencies, and potential issues. "
+    "Returns structured JSON with codebase information including API endpoints, "
+    "service architecture, and code organization."
+)
+
+_DEEPWIKI_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {
+            "type": "string",
+            "description": (
+                "Natural language query about the codebase. Examples: "
+                "'What API endpoints exist?', 'Show me payment-related services', "
+                "'What are the external dependencies?'"
+            ),
+        }
+    },
+    "required": ["query"],
+}
+
+_SENTRY_TRACES_DESCRIPTION = (
+    "Query Sentry API to get trace data and performance metrics for service endpoints. "
+    "Use this to analyze actual production behavior, performance characteristics, "
+    "and error patterns. Returns transaction traces, performance metrics (p50, p95), "
+    "error rates, and recent error events."
+)
+
+_SENTRY_TRACES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "endpoint_path": {
+            "type": "string",
+            "description": (
+                "Specific endpoint to query (e.g., 'POST /api/checkout'). "
+                "Leave empty to query all endpoints."
+            ),
+        },
+        "stats_period": {
+            "type": "string",
+            "description": "Time period for stats (e.g., '1h', '24h', '7d'). Default: '24h'",
+            "default": "24h",
+        },
+        "include_errors": {
+            "type": "boolean",
+            "description": "Whether to include error events in the response. Default: true",
+            "default": True,
+        },
+    },
+    "required": [],
+}
+
+
 def create_deepwiki_tool_definition(repo_url: str) -> dict[str, Any]:
     """
     Create tool definition for deepwiki MCP query.
@@ -280,26 +556,8 @@ def create_deepwiki_tool_definition(repo_url: str) -> dict[str, Any]:
 
     return {
         "name": "query_deepwiki_codebase",
-        "description": (
-            "Query the deepwiki MCP server to get insights about the application codebase. "
-            "Use this to discover endpoints, services, dependencies, and potential issues. "
-            "Returns structured JSON with codebase information including API endpoints, "
-            "service architecture, and code organization."
-        ),
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "query": {
-                    "type": "string",
-                    "description": (
-                        "Natural language query about the codebase. Examples: "
-                        "'What API endpoints exist?', 'Show me payment-related services', "
-                        "'What are the external dependencies?'"
-                    ),
-                }
-            },
-            "required": ["query"],
-        },
+        "description": _DEEPWIKI_DESCRIPTION,
+        "input_schema": _DEEPWIKI_SCHEMA,
         "function": tool,
     }
 
@@ -318,34 +576,7 @@ def create_sentry_traces_tool_definition(sentry_client: SentryClient) -> dict[st
 
     return {
         "name": "query_sentry_traces",
-        "description": (
-            "Query Sentry API to get trace data and performance metrics for service endpoints. "
-            "Use this to analyze actual production behavior, performance characteristics, "
-            "and error patterns. Returns transaction traces, performance metrics (p50, p95), "
-            "error rates, and recent error events."
-        ),
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "endpoint_path": {
-                    "type": "string",
-                    "description": (
-                        "Specific endpoint to query (e.g., 'POST /api/checkout'). "
-                        "Leave empty to query all endpoints."
-                    ),
-                },
-                "stats_period": {
-                    "type": "string",
-                    "description": "Time period for stats (e.g., '1h', '24h', '7d'). Default: '24h'",
-                    "default": "24h",
-                },
-                "include_errors": {
-                    "type": "boolean",
-                    "description": "Whether to include error events in the response. Default: true",
-                    "default": True,
-                },
-            },
-            "required": [],
-        },
+        "description": _SENTRY_TRACES_DESCRIPTION,
+        "input_schema": _SENTRY_TRACES_SCHEMA,
         "function": tool,
     }
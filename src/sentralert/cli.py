@@ -1,42 +1,53 @@
 """Command-line interface for the Alert Agent."""
 
 import argparse
+import asyncio
+import atexit
+import hashlib
 import json
 import os
+import re
+import shlex
+import socket
+import stat
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
-from anthropic import Anthropic
-from dotenv import load_dotenv
-
+from . import _json
 from .agent import AlertAgent
 from .agents import ServiceAnalysisAgent
 from .clients import ClaudeClient, SentryClient
 
+if TYPE_CHECKING:
+    from anthropic import Anthropic
 
-def generate_branch_name(suggestions: list[dict], anthropic_api_key: str) -> str:
-    """
-    Use Claude Haiku 3.5 to generate a good git branch name.
+# Environment variables that must be set (and non-empty) to run any mode
+_REQUIRED_ENV_VARS = frozenset({"SENTRY_AUTH_TOKEN", "SENTRY_ORG_SLUG", "ANTHROPIC_API_KEY"})
 
-    Args:
-        suggestions: List of alert suggestions
-        anthropic_api_key: Anthropic API key
+# Conservative git branch name: no leading dash, no "..", no shell metacharacters
+_BRANCH_NAME_RE = re.compile(r"^(?!-)(?!.*\.\.)[A-Za-z0-9._/-]+$")
 
-    Returns:
-        Generated branch name
-    """
-    client = Anthropic(api_key=anthropic_api_key)
+# Transaction name in a Sentry query, e.g. transaction:"/api/checkout"
+_TXN_RE = re.compile(r'transaction:"([^"]+)"')
 
-    # Summarize the suggestions for the prompt
-    summary = "\n".join([f"- {s.get('name', 'Unknown')}" for s in suggestions[:5]])
-    if len(suggestions) > 5:
-        summary += f"\n- ... and {len(suggestions) - 5} more"
+# Repository the --auto workflow commits alert files to
+_REPO_DIR = "/workspaces/python-ai/sentralert"
 
-    prompt = f"""Generate a concise git branch name for this set of alert configurations:
+# Branch names generated for a given set of alert names, persisted across runs
+_BRANCH_CACHE_FILE = (
+    Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "sentralert" / "branch_names.json"
+)
 
-{summary}
+# Seconds to wait for the daemon to accept a connection, and to finish an analysis
+_DAEMON_CONNECT_TIMEOUT = 5.0
+_DAEMON_REPLY_TIMEOUT = 900.0
 
-Requirements:
+# Static instructions for the branch name and PR description prompts; sent as
+# prompt-cached blocks ahead of the per-run alert details
+_BRANCH_NAME_RULES = """Requirements:
 - Use kebab-case (lowercase with hyphens)
 - Start with "alerts/" prefix
 - Be descriptive but concise (max 50 chars)
@@ -45,36 +56,193 @@ Requirements:
 Examples:
 - alerts/checkout-monitoring
 - alerts/payment-failure-detection
-- alerts/api-latency-alerts
+- alerts/api-latency-alerts"""
+
+_BRANCH_NAME_INSTRUCTIONS = f"""Generate a concise git branch name for the set of alert configurations listed below.
+
+{_BRANCH_NAME_RULES}
 
 Respond with ONLY the branch name, nothing else."""
 
-    response = client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=100,
-        messages=[{"role": "user", "content": prompt}],
-    )
+_PR_DESCRIPTION_INSTRUCTIONS = """You are creating a pull request description for automated alert configurations generated from Sentry data analysis.
 
-    branch_name = response.content[0].text.strip()
+The proposed alerts and the analysis flow type are listed below.
+
+Generate a concise, high-quality PR description with the following structure:
+
+## Alert configurations proposed:
+
+[For each alert, create a bullet point with:
+- The alert name
+- The endpoint/transaction being monitored (if applicable)
+- A brief description of what triggers it]
+
+**Generated from <flow type> Sentry data analysis.**
+
+@coderabbitai review these alerts for quality and potential false positives
+
+Requirements:
+- Be concise but informative
+- Focus on WHAT is being monitored, not technical implementation details
+- Use clear, professional language
+- Include all alerts in a scannable format
+- Keep the @coderabbitai tag exactly as shown above
+
+Example format:
+## Alert configurations proposed:
+
+- **High error rate in production** - Monitors overall error count; triggers when errors exceed 30/5min
+- **/api/checkout high failure rate** - Monitors checkout transaction failures; triggers at >3% failure rate
+- **/api/orders slow response time** - Monitors order endpoint latency; triggers when p95 exceeds baseline
+
+**Generated from historical Sentry data analysis.**
+
+@coderabbitai review these alerts for quality and potential false positives"""
+
+
+# Both of the above in one request; the branch name comes first so the PR
+# description can be streamed to the console as it is generated
+_BRANCH_AND_PR_INSTRUCTIONS = f"""Generate a git branch name and a pull request description for the alert configurations listed below.
+
+Respond in exactly this format and nothing else:
+- First line: BRANCH: <branch name>
+- Then a blank line
+- Then the PR description in Markdown
+
+BRANCH NAME
+{_BRANCH_NAME_RULES}
+
+PR DESCRIPTION
+{_PR_DESCRIPTION_INSTRUCTIONS}"""
+
+
+def _load_branch_cache() -> dict[str, str]:
+    """Load cached branch names, returning an empty cache if none is readable."""
+    try:
+        with open(_BRANCH_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_branch_cache(cache: dict[str, str]) -> None:
+    """Persist cached branch names; failures only cost a future API call."""
+    try:
+        _BRANCH_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(_BRANCH_CACHE_FILE, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+
+def _branch_exists(branch_name: str) -> bool:
+    """Check whether a local branch with this name already exists."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"refs/heads/{branch_name}"],
+            cwd=_REPO_DIR,
+            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
+        )
+    except OSError:
+        return False
+    return result.returncode == 0
+
+
+def _cached_branch_name(cache: dict[str, str], key: str) -> Optional[str]:
+    """
+    Look up a reusable branch name in the cache.
+
+    Names that fail validation, or that already exist as a local branch
+    (from an earlier run that created it), can't be checked out again and
+    are ignored.
+
+    Args:
+        cache: Loaded branch name cache
+        key: Cache key for the suggestions
+
+    Returns:
+        Cached branch name, or None if there is no usable one
+    """
+    branch_name = cache.get(key)
+    if branch_name is None or not _BRANCH_NAME_RE.match(branch_name):
+        return None
+    if _branch_exists(branch_name):
+        return None
     return branch_name
 
 
-def generate_pr_description(
-    suggestions: list[dict], anthropic_api_key: str, flow_type: str = "historical"
-) -> str:
+def _remember_branch_name(cache: dict[str, str], key: str, branch_name: str) -> None:
+    """Cache a generated branch name, unless it isn't a valid branch name."""
+    if _BRANCH_NAME_RE.match(branch_name):
+        cache[key] = branch_name
+        _save_branch_cache(cache)
+
+
+# Anthropic clients by API key, reused so helpers share warm HTTP connections
+_ANTHROPIC_CLIENTS: dict[str, "Anthropic"] = {}
+
+
+def _anthropic_client(api_key: str) -> "Anthropic":
     """
-    Use Claude to generate a high-quality PR description.
+    Return a shared Anthropic client for the given API key.
+
+    Args:
+        api_key: Anthropic API key
+
+    Returns:
+        Anthropic client, created on first use
+    """
+    client = _ANTHROPIC_CLIENTS.get(api_key)
+    if client is None:
+        from anthropic import Anthropic
+
+        client = _ANTHROPIC_CLIENTS[api_key] = Anthropic(api_key=api_key)
+    return client
+
+
+@atexit.register
+def _close_anthropic_clients() -> None:
+    """Close pooled HTTP connections held by shared Anthropic clients."""
+    for client in _ANTHROPIC_CLIENTS.values():
+        client.close()
+    _ANTHROPIC_CLIENTS.clear()
+
+
+def _summarize(suggestions: list[dict], limit: Optional[int] = None, prefix: str = "- ") -> str:
+    """
+    Build a bulleted list of suggestion names.
 
     Args:
         suggestions: List of alert suggestions
-        anthropic_api_key: Anthropic API key
-        flow_type: Type of analysis flow ("historical" or "service")
+        limit: Maximum number of suggestions to include (all if None)
+        prefix: Bullet prefix for each line
 
     Returns:
-        Generated PR description with alert details and CodeRabbit tag
+        Newline-separated summary lines
+    """
+    selected = suggestions[:limit] if limit else suggestions
+    return "\n".join(f"{prefix}{s.get('name', 'Unknown')}" for s in selected)
+
+
+def _branch_cache_key(suggestions: list[dict]) -> str:
+    """Key cached branch names by the set of alert names."""
+    names = "|".join(sorted(str(s.get("name", "")) for s in suggestions))
+    return hashlib.sha1(names.encode()).hexdigest()
+
+
+def _alert_details_prompt(suggestions: list[dict], flow_type: str) -> str:
     """
-    client = Anthropic(api_key=anthropic_api_key)
+    Build the per-run part of the PR description prompt.
+
+    Args:
+        suggestions: List of alert suggestions
+        flow_type: Type of analysis flow ("historical" or "service")
 
+    Returns:
+        Prompt text listing the flow type and alert details as JSON
+    """
     # Build detailed alert summary for Claude
     alert_details = []
     for suggestion in suggestions:
@@ -86,13 +254,9 @@ def generate_pr_description(
 
         # Extract endpoint/transaction from query if available
         endpoint = "N/A"
-        if "transaction:" in query:
-            # Extract transaction name from query
-            import re
-
-            match = re.search(r'transaction:"([^"]+)"', query)
-            if match:
-                endpoint = match.group(1)
+        match = _TXN_RE.search(query)
+        if match:
+            endpoint = match.group(1)
 
         alert_details.append(
             {
@@ -105,55 +269,212 @@ def generate_pr_description(
         )
 
     # Create detailed JSON for Claude
-    alerts_json = json.dumps(alert_details, indent=2)
+    alerts_json = _json.dumps(alert_details, pretty=True)
 
-    prompt = f"""You are creating a pull request description for automated alert configurations generated from Sentry data analysis.
+    return f"""Flow type: {flow_type}
 
 Here are the {len(suggestions)} alerts being proposed:
 
-{alerts_json}
+{alerts_json}"""
 
-Generate a concise, high-quality PR description with the following structure:
-
-## Alert configurations proposed:
 
-[For each alert, create a bullet point with:
-- The alert name
-- The endpoint/transaction being monitored (if applicable)
-- A brief description of what triggers it]
+def generate_branch_name(suggestions: list[dict], anthropic_api_key: str) -> str:
+    """
+    Use Claude Haiku 3.5 to generate a good git branch name.
 
-**Generated from {flow_type} Sentry data analysis.**
+    Valid names are cached by the set of alert names, so re-running against
+    the same suggestions reuses the earlier branch name without an API call,
+    as long as that branch hasn't been created yet.
 
-@coderabbitai review these alerts for quality and potential false positives
+    Args:
+        suggestions: List of alert suggestions
+        anthropic_api_key: Anthropic API key
 
-Requirements:
-- Be concise but informative
-- Focus on WHAT is being monitored, not technical implementation details
-- Use clear, professional language
-- Include all alerts in a scannable format
-- Keep the @coderabbitai tag exactly as shown above
+    Returns:
+        Generated branch name
+    """
+    key = _branch_cache_key(suggestions)
+    cache = _load_branch_cache()
+    cached = _cached_branch_name(cache, key)
+    if cached is not None:
+        return cached
 
-Example format:
-## Alert configurations proposed:
+    client = _anthropic_client(anthropic_api_key)
 
-- **High error rate in production** - Monitors overall error count; triggers when errors exceed 30/5min
-- **/api/checkout high failure rate** - Monitors checkout transaction failures; triggers at >3% failure rate
-- **/api/orders slow response time** - Monitors order endpoint latency; triggers when p95 exceeds baseline
+    # Summarize the suggestions for the prompt
+    summary = _summarize(suggestions, limit=5)
+    if len(suggestions) > 5:
+        summary += f"\n- ... and {len(suggestions) - 5} more"
 
-**Generated from historical Sentry data analysis.**
+    prompt = f"""Alert configurations:
 
-@coderabbitai review these alerts for quality and potential false positives"""
+{summary}"""
 
     response = client.messages.create(
         model="claude-3-5-haiku-20241022",
-        max_tokens=1000,
-        messages=[{"role": "user", "content": prompt}],
+        max_tokens=100,
+        messages=[
+            {
+                "role": "user",
+                "content": ClaudeClient.user_content(prompt, _BRANCH_NAME_INSTRUCTIONS),
+            }
+        ],
     )
 
-    pr_description = response.content[0].text.strip()
+    branch_name = response.content[0].text.strip()
+    _remember_branch_name(cache, key, branch_name)
+    return branch_name
+
+
+def generate_pr_description(
+    suggestions: list[dict],
+    anthropic_api_key: str,
+    flow_type: str = "historical",
+    echo: bool = False,
+) -> str:
+    """
+    Use Claude to generate a high-quality PR description.
+
+    The response is streamed, so with echo enabled the description appears
+    on stdout as it is generated rather than after the whole completion.
+
+    Args:
+        suggestions: List of alert suggestions
+        anthropic_api_key: Anthropic API key
+        flow_type: Type of analysis flow ("historical" or "service")
+        echo: Print the description to stdout while it streams in
+
+    Returns:
+        Generated PR description with alert details and CodeRabbit tag
+    """
+    client = _anthropic_client(anthropic_api_key)
+
+    prompt = _alert_details_prompt(suggestions, flow_type)
+
+    with client.messages.stream(
+        model="claude-3-5-haiku-20241022",
+        max_tokens=1000,
+        messages=[
+            {
+                "role": "user",
+                "content": ClaudeClient.user_content(prompt, _PR_DESCRIPTION_INSTRUCTIONS),
+            }
+        ],
+    ) as stream:
+        if echo:
+            for text in stream.text_stream:
+                print(text, end="", flush=True)
+            print()
+        pr_description = stream.get_final_text().strip()
+
     return pr_description
 
 
+def generate_branch_and_pr(
+    suggestions: list[dict],
+    anthropic_api_key: str,
+    flow_type: str = "historical",
+    echo: bool = False,
+) -> tuple[str, str]:
+    """
+    Use Claude to generate the branch name and PR description in one request.
+
+    A cached branch name is reused as in generate_branch_name, leaving only
+    the PR description to generate. If the reply doesn't open with the
+    branch name line, falls back to generating each separately.
+
+    Args:
+        suggestions: List of alert suggestions
+        anthropic_api_key: Anthropic API key
+        flow_type: Type of analysis flow ("historical" or "service")
+        echo: Print the PR description to stdout while it streams in
+
+    Returns:
+        Tuple of (branch name, PR description)
+    """
+    key = _branch_cache_key(suggestions)
+    cache = _load_branch_cache()
+    cached = _cached_branch_name(cache, key)
+    if cached is not None:
+        return cached, generate_pr_description(suggestions, anthropic_api_key, flow_type, echo)
+
+    client = _anthropic_client(anthropic_api_key)
+    prompt = _alert_details_prompt(suggestions, flow_type)
+
+    branch_name = None
+    with client.messages.stream(
+        model="claude-3-5-haiku-20241022",
+        max_tokens=1100,
+        messages=[
+            {
+                "role": "user",
+                "content": ClaudeClient.user_content(prompt, _BRANCH_AND_PR_INSTRUCTIONS),
+            }
+        ],
+    ) as stream:
+        buffered = ""
+        for text in stream.text_stream:
+            if branch_name is None:
+                # Hold text back until the branch name line is complete
+                buffered += text
+                first_line, newline, rest = buffered.partition("\n")
+                if not newline:
+                    continue
+                if not first_line.startswith("BRANCH:"):
+                    # Unexpected shape; stop generating and fall back below
+                    break
+                branch_name = first_line[len("BRANCH:") :].strip()
+                text = rest.lstrip("\n")
+            if echo:
+                print(text, end="", flush=True)
+        else:
+            if branch_name is not None:
+                pr_description = stream.get_final_text().partition("\n")[2].strip()
+
+    if branch_name is None:
+        return (
+            generate_branch_name(suggestions, anthropic_api_key),
+            generate_pr_description(suggestions, anthropic_api_key, flow_type, echo),
+        )
+
+    if echo:
+        print()
+    _remember_branch_name(cache, key, branch_name)
+    return branch_name, pr_description
+
+
+def _ensure_git_repo() -> bool:
+    """
+    Initialize a git repository in _REPO_DIR if there isn't one.
+
+    Returns:
+        True if a repository was initialized
+
+    Raises:
+        subprocess.CalledProcessError: If git init fails
+    """
+    result = subprocess.run(
+        ["git", "rev-parse", "--git-dir"],
+        cwd=_REPO_DIR,
+        capture_output=True,
+        text=True,
+        # Read-only check; skip git's optional index lock
+        env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
+    )
+    if result.returncode == 0:
+        return False
+
+    # Output captured so it doesn't interleave with the streamed PR description
+    subprocess.run(
+        ["git", "init"],
+        cwd=_REPO_DIR,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        check=True,
+    )
+    return True
+
+
 def auto_git_workflow(
     suggestions: list[dict], alert_files: list, anthropic_api_key: str
 ) -> None:
@@ -163,44 +484,36 @@ def auto_git_workflow(
     Args:
         suggestions: List of alert suggestions
         alert_files: List of saved alert file paths
-        anthropic_api_key: Anthropic API key for branch name generation
+        anthropic_api_key: Anthropic API key for branch name and PR description generation
     """
     try:
-        # Check if git repo exists
-        result = subprocess.run(
-            ["git", "rev-parse", "--git-dir"],
-            cwd="/workspaces/python-ai/sentralert",
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode != 0:
-            print("\n Not a git repository. Initializing git...")
-            subprocess.run(["git", "init"], cwd="/workspaces/python-ai/sentralert", check=True)
-            print("✓ Git repository initialized")
-
-        # Generate branch name using Claude
-        print("\n Generating branch name with Claude Haiku 3.5...")
-        branch_name = generate_branch_name(suggestions, anthropic_api_key)
-        print(f"✓ Generated branch name: {branch_name}")
-
-        # Create and checkout branch
-        print(f"\n Creating branch: {branch_name}")
-        subprocess.run(
-            ["git", "checkout", "-b", branch_name],
-            cwd="/workspaces/python-ai/sentralert",
-            check=True,
-        )
+        # Detect flow type from suggestions
+        flow_type = "historical"
+        if suggestions and suggestions[0].get("flow") == "service_analysis_agent":
+            flow_type = "service"
 
-        # Add alert files
-        print("\n Adding alert files...")
-        subprocess.run(
-            ["git", "add", "alerts/"],
-            cwd="/workspaces/python-ai/sentralert",
-            check=True,
-        )
+        # Check the repository in the background while Claude generates the
+        # branch name and PR description, since neither depends on the other
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            repo_initialized = executor.submit(_ensure_git_repo)
+
+            # Stream the PR description to the console as it is generated
+            print("\n Generating branch name and PR description with Claude Haiku 3.5...")
+            print("\nPR DESCRIPTION:")
+            branch_name, _ = generate_branch_and_pr(
+                suggestions, anthropic_api_key, flow_type, echo=True
+            )
+
+            if repo_initialized.result():
+                print("\n✓ Not a git repository; initialized git")
+
+        print(f"\n✓ Generated branch name: {branch_name}")
+
+        if not _BRANCH_NAME_RE.match(branch_name):
+            raise ValueError(f"Refusing to use invalid branch name: {branch_name!r}")
 
         # Generate commit message with tag for CodeRabbit
-        alert_summary = "\n".join([f"  - {s.get('name', 'Unknown')}" for s in suggestions])
+        alert_summary = _summarize(suggestions, prefix="  - ")
         commit_message = f"""Add {len(suggestions)} alert configuration(s)
 
 Alert configurations proposed:
@@ -209,42 +522,27 @@ Alert configurations proposed:
 @coderabbitai review
 """
 
-        # Commit changes
-        print("\n Creating commit...")
+        # Create branch, add alert files, commit and push in a single shell invocation
+        print(f"\n Creating branch {branch_name}, committing alert files and pushing...")
         subprocess.run(
-            ["git", "commit", "-m", commit_message],
-            cwd="/workspaces/python-ai/sentralert",
+            [
+                "sh",
+                "-c",
+                f"git checkout -b {shlex.quote(branch_name)}"
+                " && git add alerts/"
+                f" && git commit -m {shlex.quote(commit_message)}"
+                " && git push -u origin HEAD",
+            ],
+            cwd=_REPO_DIR,
+            stdin=subprocess.DEVNULL,
             check=True,
         )
-        print("✓ Commit created")
-
-        # Push branch
-        print(f"\n Pushing branch: {branch_name}")
-        subprocess.run(
-            ["git", "push", "-u", "origin", branch_name],
-            cwd="/workspaces/python-ai/sentralert",
-            check=True,
-        )
-        print("✓ Branch pushed successfully")
-
-        # Detect flow type from suggestions
-        flow_type = "historical"
-        if suggestions and suggestions[0].get("flow") == "service_analysis_agent":
-            flow_type = "service"
-
-        # Generate PR description using Claude
-        print("\n Generating PR description with Claude...")
-        pr_description = generate_pr_description(
-            suggestions, anthropic_api_key, flow_type
-        )
-        print("✓ PR description generated")
+        print("✓ Commit created and branch pushed successfully")
 
         # Display PR details for manual creation
         print("\n" + "=" * 70)
         print("PR TITLE:")
         print(f"Add {len(suggestions)} alert configuration(s)")
-        print("\nPR DESCRIPTION:")
-        print(pr_description)
         print("=" * 70)
 
         print("\n Auto workflow complete!")
@@ -261,9 +559,163 @@ Alert configurations proposed:
         print("You may need to manually commit and push the changes.")
 
 
+def _daemon_dir() -> Path:
+    """Per-user directory for the daemon socket when XDG_RUNTIME_DIR is unavailable."""
+    return Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "sentralert" / "daemon"
+
+
+def _daemon_socket() -> str:
+    """
+    Path of the unix socket served by `sentralert daemon` and probed by `sentralert service`.
+
+    Kept out of world-writable /tmp so other local users can't impersonate the
+    daemon. Resolved on each call rather than at import, so SENTRALERT_SOCKET
+    and XDG_RUNTIME_DIR set in .env (loaded by main) are honored.
+
+    Returns:
+        SENTRALERT_SOCKET if set, else a socket under XDG_RUNTIME_DIR, else
+        one under _daemon_dir()
+    """
+    if os.getenv("SENTRALERT_SOCKET"):
+        return os.environ["SENTRALERT_SOCKET"]
+    if os.getenv("XDG_RUNTIME_DIR"):
+        return str(Path(os.environ["XDG_RUNTIME_DIR"]) / "sentralert.sock")
+    return str(_daemon_dir() / "sentralert.sock")
+
+
+def _daemon_config(org_slug: str, deepwiki_repo_url: str) -> dict[str, str]:
+    """Settings a daemon's answers depend on; client and daemon must agree on them."""
+    return {"org": org_slug, "deepwiki_repo_url": deepwiki_repo_url}
+
+
+def serve_daemon(analysis_agent: ServiceAnalysisAgent) -> None:
+    """
+    Keep a service analysis agent resident and serve analyses over a unix socket.
+
+    Each connection sends one JSON line such as
+    {"analysis_type": "comprehensive", "org": ..., "deepwiki_repo_url": ...}
+    and receives {"suggestions": [...]} before the connection is closed.
+    Requests for a different org or repo than the agent's get
+    {"mismatch": "..."}, and failures {"error": "..."}. Analyses run one at
+    a time.
+
+    Args:
+        analysis_agent: Agent to reuse for every request
+    """
+    config = _daemon_config(analysis_agent.sentry_client.org, analysis_agent.deepwiki_repo_url)
+    socket_path = _daemon_socket()
+    lock = asyncio.Lock()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = _json.loads(await reader.readline())
+            requested = {name: request.get(name) for name in config}
+            if requested != config:
+                reply = {"mismatch": f"daemon serves {config}, request was for {requested}"}
+            else:
+                async with lock:
+                    suggestions = await asyncio.to_thread(
+                        analysis_agent.run_and_format,
+                        analysis_type=request.get("analysis_type", "comprehensive"),
+                    )
+                reply = {"suggestions": suggestions}
+        except Exception as e:
+            reply = {"error": str(e)}
+        writer.write(_json.dumps(reply).encode() + b"\n")
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+    async def serve() -> None:
+        server = await asyncio.start_unix_server(handle, path=socket_path)
+        # Only the owning user may connect
+        os.chmod(socket_path, 0o600)
+        print(f"\n Service analysis daemon listening on {socket_path} (Ctrl-C to stop)")
+        async with server:
+            await server.serve_forever()
+
+    socket_dir = Path(socket_path).parent
+    socket_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if socket_dir == _daemon_dir():
+        os.chmod(socket_dir, 0o700)
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+def _is_own_socket(path: str) -> bool:
+    """Check that path is a unix socket owned by the current user."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid()
+
+
+def request_from_daemon(
+    org_slug: str, deepwiki_repo_url: str, analysis_type: str = "comprehensive"
+) -> Optional[list[dict]]:
+    """
+    Run a service analysis on a running `sentralert daemon`, if there is one.
+
+    The daemon is only used if its socket belongs to the current user and it
+    serves the same Sentry org and DeepWiki repo as this invocation.
+
+    Args:
+        org_slug: Sentry organization slug this invocation is configured for
+        deepwiki_repo_url: DeepWiki repository URL this invocation is configured for
+        analysis_type: Type of analysis to run
+
+    Returns:
+        Alert suggestions from the daemon, or None if no suitable daemon answered
+
+    Raises:
+        RuntimeError: If the daemon reports that the analysis failed
+    """
+    socket_path = _daemon_socket()
+    if not os.path.exists(socket_path):
+        return None
+    if not _is_own_socket(socket_path):
+        print(f"  Ignoring {socket_path}: not a socket owned by the current user")
+        return None
+
+    request = {"analysis_type": analysis_type, **_daemon_config(org_slug, deepwiki_repo_url)}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(_DAEMON_CONNECT_TIMEOUT)
+            sock.connect(socket_path)
+            sock.settimeout(_DAEMON_REPLY_TIMEOUT)
+            sock.sendall(_json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                reply = _json.loads(f.read())
+    except socket.timeout:
+        print(f"  Daemon at {socket_path} did not answer in time; running locally")
+        return None
+    except (OSError, _json.JSONDecodeError):
+        # Stale socket or daemon went away; run the analysis locally instead
+        return None
+
+    if "mismatch" in reply:
+        print(f"  Daemon at {socket_path} has a different configuration; running locally")
+        print(f"    {reply['mismatch']}")
+        return None
+    if "error" in reply:
+        raise RuntimeError(f"Daemon analysis failed: {reply['error']}")
+    return reply["suggestions"]
+
+
 def main():
     """Main CLI entry point for running the Alert Agent."""
     # Load environment variables from .env file
+    from dotenv import load_dotenv
+
     load_dotenv()
 
     # Parse command-line arguments
@@ -273,15 +725,20 @@ def main():
         epilog="""
 Examples:
   sentralert historical          # Analyze historical Sentry data
+  sentralert historical --batch  # Validate regressions via the Message Batches API
   sentralert service             # Analyze service codebase for unmonitored endpoints
   sentralert service --auto      # Analyze and auto-commit to git branch
+  sentralert daemon              # Keep a service agent resident for later 'service' runs
         """,
     )
 
     parser.add_argument(
         "mode",
-        choices=["historical", "service"],
-        help="Analysis mode: 'historical' for past metrics, 'service' for codebase analysis",
+        choices=["historical", "service", "daemon"],
+        help=(
+            "Analysis mode: 'historical' for past metrics, 'service' for codebase analysis, "
+            "'daemon' to serve service analyses from a resident process"
+        ),
     )
 
     parser.add_argument(
@@ -290,11 +747,27 @@ Examples:
         help="Automatically create git branch, commit, and push changes",
     )
 
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached Claude responses and Sentry query results",
+    )
+
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=(
+            "Validate historical latency regressions through the Message Batches API "
+            "(cheaper, but may take minutes to complete)"
+        ),
+    )
+
     args = parser.parse_args()
 
-    # Validate required environment variables
-    required_vars = ["SENTRY_AUTH_TOKEN", "SENTRY_ORG_SLUG", "ANTHROPIC_API_KEY"]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    # Validate required environment variables (unset and empty both count as missing)
+    env = os.environ
+    present = _REQUIRED_ENV_VARS & env.keys()
+    missing_vars = sorted((_REQUIRED_ENV_VARS - present) | {var for var in present if not env[var]})
 
     if missing_vars:
         print("Error: Missing required environment variables:")
@@ -305,26 +778,46 @@ Examples:
 
     # Initialize clients
     sentry = SentryClient(
-        auth_token=os.environ["SENTRY_AUTH_TOKEN"],
-        org_slug=os.environ["SENTRY_ORG_SLUG"],
+        auth_token=env["SENTRY_AUTH_TOKEN"],
+        org_slug=env["SENTRY_ORG_SLUG"],
+        cache_ttl=0 if args.no_cache else 300.0,
     )
 
-    claude = ClaudeClient(api_key=os.environ["ANTHROPIC_API_KEY"])
+    # One pooled Anthropic client serves the flows and the --auto helpers
+    anthropic_client = _anthropic_client(env["ANTHROPIC_API_KEY"])
+    claude = ClaudeClient(
+        api_key=env["ANTHROPIC_API_KEY"], use_cache=not args.no_cache, client=anthropic_client
+    )
+
+    deepwiki_repo_url = os.getenv(
+        "DEEPWIKI_REPO_URL", "https://deepwiki.com/wuTims/sentralert-demo-service"
+    )
+
+    def service_agent() -> ServiceAnalysisAgent:
+        return ServiceAnalysisAgent(
+            anthropic_api_key=env["ANTHROPIC_API_KEY"],
+            sentry_client=sentry,
+            deepwiki_repo_url=deepwiki_repo_url,
+            client=anthropic_client,
+        )
+
+    if args.mode == "daemon":
+        serve_daemon(service_agent())
+        return
 
     # Initialize agent
-    agent = AlertAgent(sentry, claude)
+    agent = AlertAgent(sentry, claude, use_batch=args.batch)
 
     # Run analysis based on mode
     if args.mode == "service":
         print("\n Running Service Analysis Agent (Claude Agent SDK)...")
-        analysis_agent = ServiceAnalysisAgent(
-            anthropic_api_key=os.environ["ANTHROPIC_API_KEY"],
-            sentry_client=sentry,
-            deepwiki_repo_url=os.getenv(
-                "DEEPWIKI_REPO_URL", "https://deepwiki.com/wuTims/sentralert-demo-service"
-            ),
+        suggestions = request_from_daemon(
+            env["SENTRY_ORG_SLUG"], deepwiki_repo_url, analysis_type="comprehensive"
         )
-        suggestions = analysis_agent.run_and_format(analysis_type="comprehensive")
+        if suggestions is None:
+            suggestions = service_agent().run_and_format(analysis_type="comprehensive")
+        else:
+            print(f"✓ Received {len(suggestions)} suggestion(s) from daemon at {_daemon_socket()}")
     else:  # historical
         print(f"\n Running Historical Analysis...")
         suggestions = agent.run(flow="historical")
@@ -337,7 +830,7 @@ Examples:
 
         # Auto workflow if requested
         if args.auto:
-            auto_git_workflow(suggestions, files, os.environ["ANTHROPIC_API_KEY"])
+            auto_git_workflow(suggestions, files, env["ANTHROPIC_API_KEY"])
         else:
             print("\nNext steps:")
             print("  1. Review the alerts in ./alerts/")
@@ -1,27 +1,152 @@
 """Claude API client for code and metrics analysis."""
 
-import anthropic
+import hashlib
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+
+# Claude responses keyed by request content, persisted across runs
+CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "sentralert" / "claude"
+
+# Seconds a cached response stays valid, and the most responses kept on disk
+CACHE_TTL = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 1000
 
 
 class ClaudeClient:
     """Client for interacting with Claude API for analysis tasks."""
 
-    def __init__(self, api_key: str):
+    MODEL = "claude-haiku-4-5-20251001"
+    MAX_TOKENS = 2000
+
+    def __init__(
+        self, api_key: str, use_cache: bool = True, client: Optional["Anthropic"] = None
+    ):
         """
         Initialize Claude client.
 
         Args:
             api_key: Anthropic API key
+            use_cache: Reuse cached responses for identical requests; when
+                False, every request goes to the API and refreshes the cache
+            client: Existing Anthropic client to share (created if None)
         """
-        self.client = anthropic.Anthropic(api_key=api_key)
+        if client is None:
+            # Imported here so loading the package doesn't pay for the SDK import
+            import anthropic
+
+            client = anthropic.Anthropic(api_key=api_key)
+
+        self.api_key = api_key
+        self.client = client
+        self._async_client = None
+        self.use_cache = use_cache
+        self._cache_pruned = False
+
+    def _cache_key(self, prompt: str, preamble: Optional[str], temperature: float) -> str:
+        """Hash everything that determines the response of a request."""
+        parts = (self.MODEL, str(self.MAX_TOKENS), str(temperature), preamble or "", prompt)
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss or expiry."""
+        if not self.use_cache:
+            return None
+        path = CACHE_DIR / key
+        try:
+            if time.time() - path.stat().st_mtime > CACHE_TTL:
+                path.unlink()
+                return None
+            return path.read_text()
+        except OSError:
+            return None
+
+    def _cache_put(
+        self, key: str, response: str, validate: Optional[Callable[[str], bool]] = None
+    ) -> None:
+        """
+        Store a response; failures only cost a future API call.
+
+        Args:
+            key: Cache key from _cache_key
+            response: Claude's text response
+            validate: Predicate the response must pass to be stored, so
+                unusable replies aren't replayed on later runs
+        """
+        if validate is not None and not validate(response):
+            return
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and rename so readers never see partial data
+            fd, tmp = tempfile.mkstemp(dir=CACHE_DIR)
+            with os.fdopen(fd, "w") as f:
+                f.write(response)
+            os.replace(tmp, CACHE_DIR / key)
+        except OSError:
+            return
+
+        if not self._cache_pruned:
+            self._cache_pruned = True
+            self._prune_cache()
+
+    @staticmethod
+    def _prune_cache() -> None:
+        """Delete expired responses, then the oldest beyond CACHE_MAX_ENTRIES."""
+        try:
+            entries = sorted(
+                ((entry.stat().st_mtime, entry.path) for entry in os.scandir(CACHE_DIR)),
+                reverse=True,
+            )
+        except OSError:
+            return
+        cutoff = time.time() - CACHE_TTL
+        for i, (mtime, path) in enumerate(entries):
+            if i >= CACHE_MAX_ENTRIES or mtime < cutoff:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
 
-    def analyze(self, prompt: str, temperature: float = 0.0) -> str:
+    @staticmethod
+    def user_content(prompt: str, preamble: Optional[str] = None) -> Union[str, list[dict]]:
+        """
+        Build user message content, marking a static preamble for prompt caching.
+
+        Args:
+            prompt: Request-specific prompt text
+            preamble: Instructions shared across requests; cached server-side
+
+        Returns:
+            Message content for the Messages API
+        """
+        if preamble is None:
+            return prompt
+        return [
+            {"type": "text", "text": preamble, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt},
+        ]
+
+    def analyze(
+        self,
+        prompt: str,
+        temperature: float = 0.0,
+        preamble: Optional[str] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
         """
         Send analysis request to Claude using Haiku 4.5.
 
         Args:
             prompt: Analysis prompt to send to Claude
             temperature: Sampling temperature (0.0-1.0)
+            preamble: Static instructions sent before the prompt and cached
+            validate: Predicate a response must pass to be cached on disk
 
         Returns:
             Claude's text response
@@ -29,10 +154,137 @@ class ClaudeClient:
         Raises:
             anthropic.APIError: If the API request fails
         """
+        key = self._cache_key(prompt, preamble, temperature)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
         response = self.client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=2000,
+            model=self.MODEL,
+            max_tokens=self.MAX_TOKENS,
+            temperature=temperature,
+            messages=[{"role": "user", "content": self.user_content(prompt, preamble)}],
+        )
+        text = response.content[0].text
+        self._cache_put(key, text, validate)
+        return text
+
+    async def analyze_async(
+        self,
+        prompt: str,
+        temperature: float = 0.0,
+        preamble: Optional[str] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Send analysis request to Claude without blocking the event loop.
+
+        The async client is created on first use and bound to the running
+        event loop; call aclose() before that loop finishes.
+
+        Args:
+            prompt: Analysis prompt to send to Claude
+            temperature: Sampling temperature (0.0-1.0)
+            preamble: Static instructions sent before the prompt and cached
+            validate: Predicate a response must pass to be cached on disk
+
+        Returns:
+            Claude's text response
+
+        Raises:
+            anthropic.APIError: If the API request fails
+        """
+        key = self._cache_key(prompt, preamble, temperature)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        if self._async_client is None:
+            import anthropic
+
+            self._async_client = anthropic.AsyncAnthropic(api_key=self.api_key)
+
+        response = await self._async_client.messages.create(
+            model=self.MODEL,
+            max_tokens=self.MAX_TOKENS,
             temperature=temperature,
-            messages=[{"role": "user", "content": prompt}],
+            messages=[{"role": "user", "content": self.user_content(prompt, preamble)}],
         )
-        return response.content[0].text
+        text = response.content[0].text
+        self._cache_put(key, text, validate)
+        return text
+
+    async def aclose(self) -> None:
+        """Close the async client opened by analyze_async, if any."""
+        if self._async_client is not None:
+            client, self._async_client = self._async_client, None
+            await client.close()
+
+    def analyze_batch(
+        self,
+        prompts: list[str],
+        temperature: float = 0.0,
+        preamble: Optional[str] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+        poll_interval: float = 5.0,
+        timeout: float = 1800.0,
+    ) -> list[Optional[str]]:
+        """
+        Send several analysis prompts through the Message Batches API.
+
+        Batches are processed concurrently server-side at half the token cost,
+        so N prompts take roughly one round-trip instead of N.
+
+        Args:
+            prompts: Analysis prompts to send to Claude
+            temperature: Sampling temperature (0.0-1.0)
+            preamble: Static instructions sent before every prompt and cached
+            validate: Predicate a response must pass to be cached on disk
+            poll_interval: Seconds between batch status checks
+            timeout: Seconds to wait for the batch before giving up
+
+        Returns:
+            Claude's text response per prompt, in order; None for any request
+            in the batch that did not succeed
+
+        Raises:
+            anthropic.APIError: If the batch cannot be created or polled
+            TimeoutError: If the batch does not finish within the timeout
+        """
+        keys = [self._cache_key(prompt, preamble, temperature) for prompt in prompts]
+        responses = [self._cache_get(key) for key in keys]
+        pending = [i for i, response in enumerate(responses) if response is None]
+        if not pending:
+            return responses
+
+        batch = self.client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": str(i),
+                    "params": {
+                        "model": self.MODEL,
+                        "max_tokens": self.MAX_TOKENS,
+                        "temperature": temperature,
+                        "messages": [
+                            {"role": "user", "content": self.user_content(prompts[i], preamble)}
+                        ],
+                    },
+                }
+                for i in pending
+            ]
+        )
+
+        deadline = time.monotonic() + timeout
+        while batch.processing_status != "ended":
+            if time.monotonic() > deadline:
+                self.client.messages.batches.cancel(batch.id)
+                raise TimeoutError(f"Message batch {batch.id} did not finish in {timeout:.0f}s")
+            time.sleep(poll_interval)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                i = int(entry.custom_id)
+                responses[i] = entry.result.message.content[0].text
+                self._cache_put(keys[i], responses[i], validate)
+        return responses
@@ -1,53 +1,149 @@
 """Sentry API client for querying metrics and events."""
 
+import os
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from typing import Optional
 
 import requests
 
+from .. import _json
+
+# Maximum number of distinct discover queries kept in the response cache
+CACHE_MAX_ENTRIES = 128
+
+# Rows requested per discover page (the API maximum)
+PAGE_SIZE = 100
+
 
 class SentryClient:
     """Client for interacting with Sentry API to fetch metrics and events."""
 
-    def __init__(self, auth_token: str, org_slug: str):
+    def __init__(self, auth_token: str, org_slug: str, cache_ttl: float = 300.0):
         """
         Initialize Sentry client.
 
         Args:
             auth_token: Sentry API authentication token
             org_slug: Organization slug in Sentry
+            cache_ttl: Seconds to reuse discover results for an identical
+                query; 0 disables caching, as does SENTRALERT_NO_CACHE=1
         """
         self.base_url = "https://sentry.io/api/0"
         self.headers = {"Authorization": f"Bearer {auth_token}"}
         self.org = org_slug
 
+        # Shared session keeps connections alive across queries
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+
+        # Discover results by (fields, query, stats_period, max_rows) -> (expiry, rows)
+        self.cache_ttl = 0.0 if os.getenv("SENTRALERT_NO_CACHE") == "1" else cache_ttl
+        self._cache: dict[tuple, tuple[float, list[dict]]] = {}
+        self._cache_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close the underlying HTTP session and release pooled connections."""
+        self.session.close()
+
+    def invalidate(self) -> None:
+        """Drop all cached discover results."""
+        with self._cache_lock:
+            self._cache.clear()
+
     def discover(
-        self, fields: list[str], query: str, stats_period: str = "1h"
+        self,
+        fields: Sequence[str],
+        query: str,
+        stats_period: str = "1h",
+        max_rows: Optional[int] = None,
     ) -> list[dict]:
         """
         Query Sentry Discover API for metrics.
 
         Args:
-            fields: List of fields to retrieve
+            fields: Fields to retrieve
             query: Sentry query string
             stats_period: Time period for stats (e.g., "1h", "7d")
+            max_rows: Stop paginating once this many rows are fetched;
+                None fetches every page
 
         Returns:
-            List of event data dictionaries
+            List of event data dictionaries, across all result pages
+
+        Raises:
+            requests.HTTPError: If the API request fails
+        """
+        return list(self.iter_discover(fields, query, stats_period, max_rows))
+
+    def iter_discover(
+        self,
+        fields: Sequence[str],
+        query: str,
+        stats_period: str = "1h",
+        max_rows: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """
+        Query Sentry Discover API for metrics, yielding rows page by page.
+
+        Each page is parsed as soon as it arrives, so callers can start on
+        the first rows while later pages are still being fetched. Fully
+        consumed results are cached for cache_ttl seconds.
+
+        Args:
+            fields: Fields to retrieve
+            query: Sentry query string
+            stats_period: Time period for stats (e.g., "1h", "7d")
+            max_rows: Stop paginating once this many rows are fetched;
+                None fetches every page
+
+        Yields:
+            Event data dictionaries
 
         Raises:
             requests.HTTPError: If the API request fails
         """
-        param_list = [
+        key = (tuple(fields), query, stats_period, max_rows)
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                yield from entry[1]
+                return
+
+        rows = []
+        url = f"{self.base_url}/organizations/{self.org}/events/"
+        params = [
             ("statsPeriod", stats_period),
             ("query", query),
-            ("per_page", 100),
+            ("per_page", PAGE_SIZE if max_rows is None else min(PAGE_SIZE, max_rows)),
         ]
         for field in fields:
-            param_list.append(("field", field))
-
-        response = requests.get(
-            f"{self.base_url}/organizations/{self.org}/events/",
-            params=param_list,
-            headers=self.headers,
-        )
-        response.raise_for_status()
-        return response.json().get("data", [])
+            params.append(("field", field))
+
+        while True:
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            page = _json.loads(response.content).get("data", [])
+            if max_rows is not None:
+                page = page[: max_rows - len(rows)]
+            rows.extend(page)
+            yield from page
+
+            if max_rows is not None and len(rows) >= max_rows:
+                break
+
+            # Follow cursor pagination; the next link already carries the query
+            next_link = response.links.get("next", {})
+            if next_link.get("results") != "true":
+                break
+            url, params = next_link["url"], None
+
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                self._cache.pop(key, None)
+                self._cache[key] = (time.monotonic() + self.cache_ttl, rows)
+                # Evict the oldest entries once over capacity
+                while len(self._cache) > CACHE_MAX_ENTRIES:
+                    del self._cache[next(iter(self._cache))]
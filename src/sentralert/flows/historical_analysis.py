@@ -1,11 +1,121 @@
 """Historical metrics analysis flow for proposing reactive alerts."""
 
-import json
+import asyncio
 import os
+import re
+from typing import Optional
 
+from .. import _json
 from ..clients.claude_client import ClaudeClient
 from ..clients.sentry_client import SentryClient
 
+# Outermost JSON object in a Claude response, ignoring code fences and prose
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Regressions at or beyond this multiple of baseline get an alert without asking Claude
+DETERMINISTIC_RATIO = 2.0
+
+# Fixed parts of the suggestions each analysis emits; per-alert values are merged
+# in, keeping this key order (and so the YAML layout)
+_LATENCY_TEMPLATE = {
+    "kind": "sentry.metric_alert",
+    "flow": "historical",
+    "name": None,
+    "dataset": "transactions",
+    "aggregate": "p95(transaction.duration)",
+    "query": None,
+    "timeWindow": 5,
+    "thresholdType": "above",
+    "environment": None,
+    "thresholds": None,
+    "resolveThreshold": None,
+    "justification": None,
+    "severity": None,
+    "actions": None,
+}
+
+_FAILURE_TEMPLATE = {
+    "kind": "sentry.metric_alert",
+    "flow": "historical",
+    "name": None,
+    "dataset": "transactions",
+    "aggregate": "failure_rate()",
+    "query": None,
+    "timeWindow": 5,
+    "thresholdType": "above",
+    "environment": None,
+    "thresholds": None,
+    "justification": None,
+    "severity": "CRITICAL",
+    "actions": None,
+}
+
+# Upper bound on in-flight Claude requests, to stay within provider rate limits
+MAX_CONCURRENT_REQUESTS = 10
+
+# Rows read per discover query; bounds pagination (and so Sentry requests and
+# Claude candidates) to the single page the flow has always analyzed
+MAX_DISCOVER_ROWS = 100
+
+# Static instructions shared by every latency validation prompt (prompt-cached)
+_LATENCY_INSTRUCTIONS = """Analyze the latency regression described below.
+
+Respond with valid JSON only:
+{
+  "alert_name": "brief descriptive name",
+  "justification": "2-3 sentences explaining why this alert is needed",
+  "severity": "LOW/MEDIUM/HIGH/CRITICAL",
+  "warning_threshold_ms": <number>,
+  "critical_threshold_ms": <number>,
+  "is_legitimate": true/false
+}
+
+Only mark is_legitimate=true if regression > 30% and current latency > 500ms.
+"""
+
+# Fields a legitimate verdict must carry to become a suggestion
+_VERDICT_FIELDS = (
+    "alert_name",
+    "justification",
+    "severity",
+    "warning_threshold_ms",
+    "critical_threshold_ms",
+)
+
+
+def _parse_verdict(response: str) -> dict:
+    """
+    Parse Claude's JSON verdict on a latency regression.
+
+    Args:
+        response: Claude's text response
+
+    Returns:
+        Verdict dictionary
+
+    Raises:
+        ValueError: If the response holds no JSON object (JSONDecodeError included)
+        KeyError: If a legitimate verdict lacks a required field
+    """
+    match = _JSON_RE.search(response)
+    analysis = _json.loads(match.group(0) if match else response)
+    if not isinstance(analysis, dict):
+        raise ValueError("verdict is not a JSON object")
+    if analysis.get("is_legitimate"):
+        missing = [field for field in _VERDICT_FIELDS if field not in analysis]
+        if missing:
+            raise KeyError(missing[0])
+    return analysis
+
+
+def _is_valid_verdict(response: str) -> bool:
+    """Check that a response parses into a usable verdict (worth caching)."""
+    try:
+        _parse_verdict(response)
+    except (ValueError, KeyError):
+        return False
+    return True
+
 
 class HistoricalAnalysisFlow:
     """
@@ -17,16 +127,25 @@ class HistoricalAnalysisFlow:
     - High failure rates per transaction
     """
 
-    def __init__(self, sentry_client: SentryClient, claude_client: ClaudeClient):
+    def __init__(
+        self,
+        sentry_client: SentryClient,
+        claude_client: ClaudeClient,
+        use_batch: bool = False,
+    ):
         """
         Initialize the historical analysis flow.
 
         Args:
             sentry_client: Client for querying Sentry metrics
             claude_client: Client for AI-powered analysis
+            use_batch: Validate regressions through the Message Batches API
+                (cheaper, but can take minutes) instead of concurrent requests
         """
         self.sentry = sentry_client
         self.claude = claude_client
+        self.use_batch = use_batch
+        self.notify_email = os.getenv("ALERTS_NOTIFY_EMAIL", "team@example.com")
 
     def analyze_and_propose(self, environment: str = "production") -> list[dict]:
         """
@@ -42,26 +161,35 @@ class HistoricalAnalysisFlow:
         print("FLOW 1: HISTORICAL METRICS ANALYSIS")
         print("=" * 70)
 
-        suggestions = []
+        return asyncio.run(self._analyze_and_propose_async(environment))
 
-        # Analyze latency patterns
-        print("\nAnalyzing transaction latency patterns...")
-        latency_alerts = self._analyze_latency_regression(environment)
-        suggestions.extend(latency_alerts)
+    async def _analyze_and_propose_async(self, environment: str) -> list[dict]:
+        """
+        Run the latency, error rate and failure rate analyses concurrently.
 
-        # Analyze error rates
-        print("Analyzing error rate patterns...")
-        error_alerts = self._analyze_error_rates(environment)
-        suggestions.extend(error_alerts)
+        Args:
+            environment: Sentry environment to analyze
 
-        # Analyze failure rates per transaction
+        Returns:
+            List of alert suggestions
+        """
+        print("\nAnalyzing transaction latency patterns...")
+        print("Analyzing error rate patterns...")
         print("Analyzing failure rates per endpoint...")
-        failure_alerts = self._analyze_failure_rates(environment)
-        suggestions.extend(failure_alerts)
 
-        return suggestions
+        try:
+            results = await asyncio.gather(
+                self._analyze_latency_regression_async(environment),
+                asyncio.to_thread(self._analyze_error_rates, environment),
+                asyncio.to_thread(self._analyze_failure_rates, environment),
+            )
+        finally:
+            # The async client is bound to this event loop
+            await self.claude.aclose()
 
-    def _analyze_latency_regression(self, environment: str) -> list[dict]:
+        return [suggestion for alerts in results for suggestion in alerts]
+
+    async def _analyze_latency_regression_async(self, environment: str) -> list[dict]:
         """
         Detect p95 latency regressions.
 
@@ -71,18 +199,13 @@ class HistoricalAnalysisFlow:
         Returns:
             List of latency-related alert suggestions
         """
-        # Get 7-day baseline
-        baseline = self.sentry.discover(
-            ["transaction", "p95(transaction.duration)", "count()"],
-            f"event.type:transaction environment:{environment}",
-            "7d",
-        )
+        fields = ["transaction", "p95(transaction.duration)", "count()"]
+        query = f"event.type:transaction environment:{environment}"
 
-        # Get 1-hour current
-        current = self.sentry.discover(
-            ["transaction", "p95(transaction.duration)", "count()"],
-            f"event.type:transaction environment:{environment}",
-            "1h",
+        # Get 7-day baseline and 1-hour current
+        baseline, current = await asyncio.gather(
+            asyncio.to_thread(self.sentry.discover, fields, query, "7d", MAX_DISCOVER_ROWS),
+            asyncio.to_thread(self.sentry.discover, fields, query, "1h", MAX_DISCOVER_ROWS),
         )
 
         # Build baseline dict
@@ -90,82 +213,211 @@ class HistoricalAnalysisFlow:
             row["transaction"]: row["p95(transaction.duration)"] for row in baseline
         }
 
+        # Pass 1: pick out regressing transactions
+        regressions = [
+            (tx, p95_now, p95_base)
+            for row in current
+            if (p95_base := baseline_map.get(tx := row["transaction"]))
+            and (p95_now := row["p95(transaction.duration)"]) > 500
+            and p95_now > 1.4 * p95_base
+        ]
+
+        # Clear-cut regressions get a template alert; only borderline ones are
+        # left for Claude to judge
         suggestions = []
-        for row in current:
-            tx = row["transaction"]
-            p95_now = row["p95(transaction.duration)"]
-            p95_base = baseline_map.get(tx)
+        candidates = []
+        seen = set()
+        for tx, p95_now, p95_base in regressions:
+            # Near-identical measurements would get the same verdict
+            key = (tx, round(p95_now, -2), round(p95_base, -2))
+            if key in seen:
+                continue
+            seen.add(key)
+
+            if p95_now >= DETERMINISTIC_RATIO * p95_base:
+                name = f"{tx} p95 latency regression"
+                suggestions.append(
+                    self._latency_suggestion(
+                        tx,
+                        environment,
+                        p95_base,
+                        name=name,
+                        warning=int(p95_base * 1.3),
+                        critical=int(p95_base * 1.6),
+                        justification=(
+                            f"p95 latency rose from {p95_base:.0f}ms over the last 7 days to "
+                            f"{p95_now:.0f}ms in the last hour, more than double the baseline."
+                        ),
+                        severity="HIGH",
+                    )
+                )
+                print(f"  Proposed: {name}")
+            else:
+                candidates.append((tx, p95_base, self._latency_prompt(tx, p95_base, p95_now)))
+
+        if not candidates:
+            return suggestions
+
+        # Pass 2: ask Claude to validate and enrich all candidates at once
+        prompts = [prompt for _, _, prompt in candidates]
+        if self.use_batch:
+            responses = await asyncio.to_thread(self._analyze_prompts, prompts)
+        else:
+            responses = await self._analyze_prompts_async(prompts)
+
+        # Pass 3: turn Claude's verdicts into alert suggestions
+        for (tx, p95_base, _), response in zip(candidates, responses):
+            if response is None:
+                continue
+            try:
+                analysis = _parse_verdict(response)
+
+                if analysis.get("is_legitimate"):
+                    suggestions.append(
+                        self._latency_suggestion(
+                            tx,
+                            environment,
+                            p95_base,
+                            name=analysis["alert_name"],
+                            warning=analysis["warning_threshold_ms"],
+                            critical=analysis["critical_threshold_ms"],
+                            justification=analysis["justification"],
+                            severity=analysis["severity"],
+                        )
+                    )
+                    print(f"  Proposed: {analysis['alert_name']}")
+                else:
+                    print(f"  Skipped: {tx} (not significant enough)")
 
-            if p95_base and p95_now > 500 and p95_now > 1.4 * p95_base:
-                # Ask Claude to validate and enrich
-                prompt = f"""Analyze this latency regression:
+            except (ValueError, KeyError) as e:
+                print(f"  Failed to parse Claude response: {e}")
 
-TRANSACTION: {tx}
-- Baseline p95 (7d): {p95_base:.0f}ms
-- Current p95 (1h): {p95_now:.0f}ms
-- Regression: {((p95_now/p95_base - 1) * 100):.1f}%
+        return suggestions
 
-Respond with valid JSON only:
-{{
-  "alert_name": "brief descriptive name",
-  "justification": "2-3 sentences explaining why this alert is needed",
-  "severity": "LOW/MEDIUM/HIGH/CRITICAL",
-  "warning_threshold_ms": <number>,
-  "critical_threshold_ms": <number>,
-  "is_legitimate": true/false
-}}
+    def _latency_suggestion(
+        self,
+        tx: str,
+        environment: str,
+        p95_base: float,
+        name: str,
+        warning: float,
+        critical: float,
+        justification: str,
+        severity: str,
+    ) -> dict:
+        """
+        Build a p95 latency alert suggestion for a transaction.
 
-Only mark is_legitimate=true if regression > 30% and current latency > 500ms.
-"""
+        Args:
+            tx: Transaction name
+            environment: Sentry environment the alert applies to
+            p95_base: Baseline p95 latency (ms), used for the resolve threshold
+            name: Alert name
+            warning: Warning threshold (ms)
+            critical: Critical threshold (ms)
+            justification: Why the alert is needed
+            severity: LOW/MEDIUM/HIGH/CRITICAL
 
-                try:
-                    response = self.claude.analyze(prompt)
-                    # Strip markdown
-                    if "```json" in response:
-                        response = response.split("```json")[1].split("```")[0].strip()
-                    elif "```" in response:
-                        response = response.split("```")[1].split("```")[0].strip()
-
-                    analysis = json.loads(response)
-
-                    if analysis.get("is_legitimate"):
-                        suggestions.append(
-                            {
-                                "kind": "sentry.metric_alert",
-                                "flow": "historical",
-                                "name": analysis["alert_name"],
-                                "dataset": "transactions",
-                                "aggregate": "p95(transaction.duration)",
-                                "query": f'event.type:transaction transaction:"{tx}" environment:{environment}',
-                                "timeWindow": 5,
-                                "thresholdType": "above",
-                                "environment": environment,
-                                "thresholds": {
-                                    "warning": analysis["warning_threshold_ms"],
-                                    "critical": analysis["critical_threshold_ms"],
-                                },
-                                "resolveThreshold": int(p95_base * 1.1),
-                                "justification": analysis["justification"],
-                                "severity": analysis["severity"],
-                                "actions": [
-                                    {
-                                        "type": "email",
-                                        "targetType": "specific",
-                                        "targetIdentifier": os.getenv(
-                                            "ALERTS_NOTIFY_EMAIL", "team@example.com"
-                                        ),
-                                    }
-                                ],
-                            }
-                        )
-                        print(f"  Proposed: {analysis['alert_name']}")
-                    else:
-                        print(f"  Skipped: {tx} (not significant enough)")
+        Returns:
+            Alert suggestion dictionary
+        """
+        return {
+            **_LATENCY_TEMPLATE,
+            "name": name,
+            "query": f'event.type:transaction transaction:"{tx}" environment:{environment}',
+            "environment": environment,
+            "thresholds": {"warning": warning, "critical": critical},
+            "resolveThreshold": int(p95_base * 1.1),
+            "justification": justification,
+            "severity": severity,
+            "actions": self._email_actions(),
+        }
 
-                except (json.JSONDecodeError, KeyError) as e:
-                    print(f"  Failed to parse Claude response: {e}")
+    def _email_actions(self) -> list[dict]:
+        """Build the notification actions shared by every suggestion."""
+        return [{"type": "email", "targetType": "specific", "targetIdentifier": self.notify_email}]
 
-        return suggestions
+    async def _analyze_prompts_async(self, prompts: list[str]) -> list[Optional[str]]:
+        """
+        Get Claude responses for several prompts with bounded concurrency.
+
+        Args:
+            prompts: Analysis prompts
+
+        Returns:
+            Claude's text response per prompt, in order; None where the
+            request failed
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def analyze(prompt: str) -> str:
+            async with semaphore:
+                return await self.claude.analyze_async(
+                    prompt, preamble=_LATENCY_INSTRUCTIONS, validate=_is_valid_verdict
+                )
+
+        results = await asyncio.gather(
+            *(analyze(prompt) for prompt in prompts), return_exceptions=True
+        )
+
+        responses = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"  Claude request failed: {result}")
+                result = None
+            responses.append(result)
+        return responses
+
+    def _analyze_prompts(self, prompts: list[str]) -> list[str]:
+        """
+        Get Claude responses for several prompts, batching when possible.
+
+        Uses the Message Batches API and falls back to one request per prompt
+        for anything the batch could not answer.
+
+        Args:
+            prompts: Analysis prompts
+
+        Returns:
+            Claude's text response per prompt, in order
+        """
+        try:
+            responses = self.claude.analyze_batch(
+                prompts, preamble=_LATENCY_INSTRUCTIONS, validate=_is_valid_verdict
+            )
+        except Exception as e:
+            print(f"  Batch analysis unavailable ({e}); falling back to individual requests")
+            responses = [None] * len(prompts)
+
+        return [
+            response
+            if response is not None
+            else self.claude.analyze(
+                prompt, preamble=_LATENCY_INSTRUCTIONS, validate=_is_valid_verdict
+            )
+            for prompt, response in zip(prompts, responses)
+        ]
+
+    @staticmethod
+    def _latency_prompt(tx: str, p95_base: float, p95_now: float) -> str:
+        """
+        Build the per-transaction part of a latency validation prompt.
+
+        The instructions are sent separately as the cached _LATENCY_INSTRUCTIONS.
+
+        Args:
+            tx: Transaction name
+            p95_base: Baseline p95 latency over 7 days (ms)
+            p95_now: Current p95 latency over the last hour (ms)
+
+        Returns:
+            Prompt text
+        """
+        return f"""TRANSACTION: {tx}
+- Baseline p95 (7d): {p95_base:.0f}ms
+- Current p95 (1h): {p95_now:.0f}ms
+- Regression: {((p95_now/p95_base - 1) * 100):.1f}%
+"""
 
     def _analyze_error_rates(self, environment: str) -> list[dict]:
         """
@@ -179,7 +431,7 @@ Only mark is_legitimate=true if regression > 30% and current latency > 500ms.
         """
         # Get error counts for last hour
         errors = self.sentry.discover(
-            ["count()"], f"event.type:error environment:{environment}", "1h"
+            ["count()"], f"event.type:error environment:{environment}", "1h", MAX_DISCOVER_ROWS
         )
 
         if not errors:
@@ -203,15 +455,7 @@ Only mark is_legitimate=true if regression > 30% and current latency > 500ms.
                     "thresholds": {"warning": 30, "critical": 50},
                     "justification": f"Detected {error_count} errors in the last hour, which exceeds normal baseline.",
                     "severity": "HIGH",
-                    "actions": [
-                        {
-                            "type": "email",
-                            "targetType": "specific",
-                            "targetIdentifier": os.getenv(
-                                "ALERTS_NOTIFY_EMAIL", "team@example.com"
-                            ),
-                        }
-                    ],
+                    "actions": self._email_actions(),
                 }
             ]
 
@@ -227,10 +471,11 @@ Only mark is_legitimate=true if regression > 30% and current latency > 500ms.
         Returns:
             List of failure rate alert suggestions
         """
-        failure_data = self.sentry.discover(
+        failure_data = self.sentry.iter_discover(
             ["transaction", "failure_rate()"],
             f"event.type:transaction environment:{environment}",
             "1h",
+            MAX_DISCOVER_ROWS,
         )
 
         suggestions = []
@@ -242,30 +487,17 @@ Only mark is_legitimate=true if regression > 30% and current latency > 500ms.
             if failure_rate > 0.05:
                 suggestions.append(
                     {
-                        "kind": "sentry.metric_alert",
-                        "flow": "historical",
+                        **_FAILURE_TEMPLATE,
                         "name": f"{tx} high failure rate",
-                        "dataset": "transactions",
-                        "aggregate": "failure_rate()",
                         "query": f'event.type:transaction transaction:"{tx}" environment:{environment}',
-                        "timeWindow": 5,
-                        "thresholdType": "above",
                         "environment": environment,
+                        # Built per suggestion so callers can edit one alert's thresholds
                         "thresholds": {
                             "warning": 0.03,  # 3%
                             "critical": 0.05,  # 5%
                         },
                         "justification": f"Current failure rate is {failure_rate*100:.1f}%, which is critically high for a user-facing endpoint.",
-                        "severity": "CRITICAL",
-                        "actions": [
-                            {
-                                "type": "email",
-                                "targetType": "specific",
-                                "targetIdentifier": os.getenv(
-                                    "ALERTS_NOTIFY_EMAIL", "team@example.com"
-                                ),
-                            }
-                        ],
+                        "actions": self._email_actions(),
                     }
                 )
                 print(f"  Proposed: {tx} failure rate alert")